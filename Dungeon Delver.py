@@ -1,433 +1,311 @@
-import pygame, sys, random, time, math
-
-# Initialize Pygame
-pygame.init()
-
-chest_interacted = False  # Tracks if the chest interaction key has already been handled
-
-def get_room_colors(tier):
-    """
-    Returns a color scheme for the room based on its tier.
-    :param tier: The current tier of the room.
-    :return: A dictionary with background and wall colors.
-    """
-    # Define muted, dungeon-appropriate colors
-    color_schemes = [
-        {"bg": (30, 30, 30), "wall": (80, 80, 80)},    # Tier 1
-        {"bg": (40, 35, 30), "wall": (90, 80, 70)},    # Tier 2
-        {"bg": (35, 30, 40), "wall": (85, 75, 90)},    # Tier 3
-        {"bg": (30, 40, 35), "wall": (80, 90, 85)},    # Tier 4
-        {"bg": (40, 40, 30), "wall": (100, 100, 75)},  # Tier 5
-        {"bg": (30, 30, 45), "wall": (70, 70, 100)},   # Tier 6
-        {"bg": (25, 35, 25), "wall": (60, 80, 60)},    # Tier 7
-        {"bg": (50, 40, 30), "wall": (110, 90, 70)},   # Tier 8
-        {"bg": (35, 35, 35), "wall": (100, 100, 100)}, # Tier 9
-        {"bg": (20, 20, 20), "wall": (60, 60, 60)},    # Tier 10+
-    ]
+import pygame, sys, time, math, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from spatial_hash import SpatialHash
+from enemy_store import EnemyStore
+from entities import Enemy, EnemyWeapon
+from content import DEFAULT_PLAYER_STATS, WILDBOYS, generate_equipment, get_enemy_ranges_for_tier, get_room_colors, get_tier
+from room_layout import FreeSpace, LayoutPool
+from navigation import FlowField, nav_grid
+from wildboy_conditions import WildboyConditions
+from text_cache import get_font, text_cache
+from ui import Box, Label, Layout, TextBlock, Widget
+from game_state import GameState
+from replay import InputRecorder, Replay
+from frame_profiler import FrameProfiler
+from event_log import EventLog
+
+
+def log_event(state, kind, **fields):
+    """
+    Records a gameplay event in the session's EventLog, if it has one. Every event
+    also carries the run seed, the game time and the room.
+    """
+    if state.events is not None:
+        fields["run"] = state.rng.seed
+        fields["t"] = round(state.game_time, 4)
+        fields["room"] = state.room_id
+        state.events.emit(kind, fields)
 
-    # Clamp tier to available schemes
-    capped_tier = min(tier, len(color_schemes))
-    return color_schemes[capped_tier - 1]
+def invalidate_inventory_layout(state):
+    """
+    Drops the laid-out inventory screen (see get_inventory_layout()).
+    Call this whenever the inventory or the equipment changes.
+    """
+    state.inventory_layout = None
 
-def calculate_final_stats(damage=0):
+def invalidate_stats(state):
     """
-    Calculates the player's final stats based on base stats and equipped items.
-    :param damage: The amount of damage to apply to the player's health.
-    :return: A dictionary of the final stats.
+    Marks the cached final stats as stale.
+    Call this whenever equipment, Wildboys or the base player stats change.
+    """
+    state.stats_dirty = True
+
+def aggregate_stats(state):
+    """
+    Builds the player's stats from base stats and equipped items. Wildboys are
+    added on top by apply_wildboys(), depending on these stats.
+    :return: A new dictionary of the aggregated stats.
     """
-    final_stats = player_stats.copy()
+    final_stats = state.player_stats.copy()
     
     # Add stats from equipped weapon
-    if equipment["Weapons"]:
-        weapon = equipment["Weapons"][0]
-        for stat, value in weapon["Stats"].items():
+    if state.equipment["Weapons"]:
+        weapon = state.equipment["Weapons"][0]
+        for stat, value in weapon.stats.items():
             if stat in final_stats:
                 final_stats[stat] += value
 
     # Add stats from equipped armor
-    if equipment["Armor"]:
-        armor = equipment["Armor"][0]
-        for stat, value in armor["Stats"].items():
+    if state.equipment["Armor"]:
+        armor = state.equipment["Armor"][0]
+        for stat, value in armor.stats.items():
             if stat == "Health":  # Health on armor increases MaxHealth
                 final_stats["MaxHealth"] += value
             elif stat in final_stats:
                 final_stats[stat] += value
-    
-    # Add stats from Wildboys
-    for wildboy in equipment["Wildboys"]:
-        for stat, value in wildboy["Stats"].items():
-            if stat in final_stats:
-                final_stats[stat] += value
-    
-    
+
+    return final_stats
+
+def apply_wildboys(state):
+    """
+    Returns the final stats: the cached gear stats plus the bonuses of the Wildboys
+    whose condition currently holds. The conditions are checked against the gear
+    stats and current Health, so Wildboys never switch each other on or off, and
+    the final stats are only rebuilt when the set of active Wildboys changes.
+    """
+    gear_stats = state.gear_stats
+    gear_stats["Health"] = state.player_stats["Health"]
+    active = state.wildboy_conditions.active(gear_stats)
+    if state.final_stats_cache is None or active is not state.active_wildboys:
+        final_stats = gear_stats.copy()
+        for wildboy in active:
+            for stat, value in wildboy.stats.items():
+                if stat in final_stats:
+                    final_stats[stat] += value
+        state.final_stats_cache = final_stats
+        state.active_wildboys = active
+    return state.final_stats_cache
+
+def calculate_final_stats(state, damage=0, source=None):
+    """
+    Returns the player's final stats based on base stats, equipped items and the
+    active Wildboys. The gear aggregate is only rebuilt after invalidate_stats();
+    otherwise damage is applied as a delta to the cached stats.
+    :param damage: The amount of damage to apply to the player's health.
+    :param source: What dealt the damage ("sword" or "contact"), for the event log.
+    :return: A dictionary of the final stats (shared, do not modify).
+    """
+    if state.profiler is not None:
+        state.profiler.count("stat_calls")
+    if state.stats_dirty or state.gear_stats is None:
+        state.gear_stats = aggregate_stats(state)
+        state.wildboy_conditions = WildboyConditions(state.equipment["Wildboys"])
+        state.final_stats_cache = None
+        state.stats_dirty = False
+        if state.profiler is not None:
+            state.profiler.count("stat_rebuilds")
+    final_stats = apply_wildboys(state)
+
     # Apply damage with modifiers
     if damage > 0:
         effective_damage = max(1, damage - final_stats["Armor"])  # Minimum of 1 damage
-        final_stats["Health"] -= effective_damage
-        # Update the global player_stats with the new health
-        player_stats["Health"] = final_stats["Health"]
+        state.player_stats["Health"] -= effective_damage
+        if state.room_log:
+            state.room_log[-1]["damage_taken"] += effective_damage
+        log_event(state, "damage_taken", source=source, damage=damage, amount=effective_damage, health=state.player_stats["Health"])
+        final_stats = apply_wildboys(state)  # Health conditions may have changed
 
     # Ensure current Health does not exceed MaxHealth
-    final_stats["Health"] = min(final_stats["Health"], final_stats["MaxHealth"])
-    player_stats["Health"] = final_stats["Health"]  # Sync with player_stats
+    state.player_stats["Health"] = min(state.player_stats["Health"], final_stats["MaxHealth"])
+    final_stats["Health"] = state.player_stats["Health"]  # Sync with player_stats
     return final_stats
 
-# Levelgate
-levelgate_rect = None
-levelgate_spawned = False  
-levelgate_used = False  
-levelgate_should_spawn = False  
-
 # Health Fountain
-health_fountain_rect = None
 COLOR_FOUNTAIN = (255, 150, 150)  # Light red color for the fountain
-fountain_spawned = False  # Tracks if the health fountain has been spawned
-fountain_used = False  # Tracks if the player has already used the fountain
-fountain_should_spawn = False  # Tracks if the fountain should spawn in the next room
 
-# Chest checker
-chest_rect = None  # Will store the chest rectangle
-chest_spawned = False  # Tracks if the chest has already been spawned
+# Chest
 COLOR_CHEST = (150, 100, 50)  # Chest color for visualization
-chest_opened = False  # Flag to track if the chest has been opened
-chest_item = None  # Tracks the item currently in the chest
 
-def select_random_wildboys():
+def select_random_wildboys(state):
     """
     Randomly selects three Wildboys from the WILDBOYS list.
     Ensures the selection doesn't exceed the available Wildboys.
     """
-    return random.sample(WILDBOYS, min(3, len(WILDBOYS)))
+    return state.rng.wildboys.sample(WILDBOYS, min(3, len(WILDBOYS)))
 
-def add_to_inventory(item, item_type):
+def add_to_inventory(state, item, item_type):
     """
     Adds an item to the inventory while respecting the cap of 3 items.
-    :param item: The item to add (dict with 'Name' and 'Stats').
+    :param item: The item to add (an Equipment).
     :param item_type: The type of item ('Weapons' or 'Armor').
     """
-    if item_type not in inventory:
+    if item_type not in state.inventory:
         return
     
-    if len(inventory[item_type]) < 3:
-        inventory[item_type].append(item)
+    if len(state.inventory[item_type]) < 3:
+        state.inventory[item_type].append(item)
+        invalidate_inventory_layout(state)
     else:
-        print(f"Cannot add {item['Name']} to {item_type}. Inventory is full!")
+        log_event(state, "inventory_full", item=item.name)
 
 # Window settings
 WIDTH, HEIGHT = 800, 600
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Dungeon Prototype")
+WIN = None  # Display surface, created by main(); headless runs never open a window
 
 # Colors
-COLOR_BG = (30, 30, 30)
 COLOR_PLAYER = (200, 200, 50)
-COLOR_WALL = (100, 100, 100)
 COLOR_ENEMY = (200, 50, 50)
 COLOR_HEALTH_BG = (100, 0, 0)
 COLOR_HEALTH = (200, 0, 0)
 COLOR_GAME_OVER = (255, 255, 255)
 COLOR_SWORD = (150, 150, 150)  # Just to visualize the sword hit area
 
-def generate_equipment(tier, equipment_type):
-    """Generate a weapon or armor based on tier."""
-    # Define the stat ranges for weapons and armor
-    stat_ranges = {
-        "Weapon": {
-            "AttackLength": [(15, 25), (15, 50), (15, 60), (15, 70), (15, 90), (15, 110), (15, 120), (15, 130), (15, 140), (15, 150), (15, 160)],
-            "AttackWidth": [(15, 25), (15, 50), (15, 60), (15, 70), (15, 90), (15, 110), (15, 120), (15, 130), (15, 140), (15, 150), (15, 160)],
-            "AttackDamage": [(4, 5), (5, 10), (8, 15), (12, 20), (15, 30), (20, 50), (25, 60), (30, 70), (35, 80), (40, 90), (45, 100)],
-        },
-        "Armor": {
-            "Armor": [(0, 0), (1, 3), (2, 5), (3, 7), (4, 10), (5, 15), (6, 18), (7, 20), (8, 22), (9, 24), (10, 25)],
-            "Health": [(0, 0), (10, 20), (15, 30), (20, 40), (25, 50), (30, 60), (35, 70), (40, 80), (45, 90), (50, 100), (55, 110)],
-            "AttackSpeed": [(0, 0), (-0.3, 0.3), (-0.4, 0.4), (-0.5, 0.5), (-0.6, 0.6), (-0.7, 0.7), (-0.8, 0.8), (-0.9, 0.9), (-1.0, 1.0), (-1.1, 1.1), (-1.2, 1.2)],
-            "MovementSpeed": [(0, 0), (-1, 1), (-1, 2), (0, 3), (1, 4), (2, 5), (3, 6), (4, 7), (5, 8), (6, 9), (7, 10)],
-        },
-    }
-
-    # Special handling for starter weapon (tier 0)
-    if tier == 0 and equipment_type == "Weapon":
-        stats = {
-            "AttackLength": random.randint(*stat_ranges["Weapon"]["AttackLength"][0]),
-            "AttackWidth": random.randint(*stat_ranges["Weapon"]["AttackWidth"][0]),
-            "AttackDamage": random.randint(*stat_ranges["Weapon"]["AttackDamage"][0]),
-        }
-        name = "Starter Weapon"
-        return {"Name": name, "Stats": stats}
-
-    # Adjust tier for indexing (tier 1 corresponds to index 1)
-    tier_index = min(max(1, tier), 10)  # Clamp to valid range (1-10)
-
-    # Generate stats
-    stats = {stat: round(random.uniform(*stat_ranges[equipment_type][stat][tier_index]), 2) if "AttackSpeed" in stat
-             else random.randint(*stat_ranges[equipment_type][stat][tier_index])
-             for stat in stat_ranges[equipment_type]}
-
-    # Generate names with broader conditions for prefixes and suffixes
-    if equipment_type == "Weapon":
-        prefixes = ["Keen", "Long", "Broad", "Deadly", "Sharp"]
-        suffixes = ["Blade", "Cleaver", "Sword", "Axe", "Dagger"]
-        prefix = random.choice(prefixes)
-        suffix = random.choice(suffixes)
-    elif equipment_type == "Armor":
-        prefixes = ["Sturdy", "Vital", "Swift", "Resilient", "Fortified"]
-        suffixes = ["Vest", "Mail", "Plate", "Guard", "Shield"]
-        prefix = random.choice(prefixes)
-        suffix = random.choice(suffixes)
-
-    # Add conditions to further refine the naming logic
-    if equipment_type == "Weapon":
-        if stats["AttackDamage"] > 50:
-            prefix = "Deadly"
-        elif stats["AttackLength"] > stats["AttackWidth"] + 10:
-            prefix = "Long"
-        elif stats["AttackWidth"] > stats["AttackLength"] + 10:
-            suffix = "Cleaver"
-    elif equipment_type == "Armor":
-        if stats["Armor"] > 15:
-            prefix = "Fortified"
-        elif stats["Health"] > 50:
-            prefix = "Vital"
-        elif abs(stats["AttackSpeed"]) < 0.5:
-            suffix = "Mail"
-
-    # Generate the name and return the result
-    name = f"{prefix} Level {tier} {suffix}"
-    return {"Name": name, "Stats": stats}
-
-# Default Player Stats
-DEFAULT_PLAYER_STATS = {
-    "Health": 100,
-    "MaxHealth": 100,
-    "Armor": 0,
-    "AttackDamage": 10,
-    "AttackSpeed": 2.0,    # attacks per second
-    "AttackLength": 0,  # length of sword attack
-    "AttackWidth": 0,   # width of sword attack
-    "MovementSpeed": 2,
-    "DashDistance": 250,
-    "DashCooldown": 1
-}
-
-# Define possible Wildboys
-WILDBOYS = [
-    {
-        "Name": "Wildboy of Girth + 20 AD (if MH > 120)",
-        "Stats": {"AttackDamage": 20},
-        "Condition": lambda stats: stats["MaxHealth"] > 120  
-    },
-    {
-        "Name": "Wildboy of Slow + 5 A (if MS < 2)",
-        "Stats": {"Armor": 5},
-        "Condition": lambda stats: stats["MovementSpeed"] < 2  
-    },
-    {
-        "Name": "Wildboy of Wilding + 200 W (if A = 0)",
-        "Stats": {"AttackWidth": 200},
-        "Condition": lambda stats: stats["Armor"] == 0  # 
-    },
-    {
-        "Name": "Wildboy of Quick + 4.0 AS (if AD < 15)",
-        "Stats": {"AttackSpeed": 4.0},
-        "Condition": lambda stats: stats["AttackDamage"] < 15
-    },
-    {
-        "Name": "Wildboy of Wideboy + 500 AW (if AL = 15)",
-        "Stats": {"AttackWidth": 500},
-        "Condition": lambda stats: stats["Attacklength"] == 15  
-    },
-    {
-        "Name": "Wildboy of Long + 200 AL (if AW = 15)",
-        "Stats": {"AttackLength": 200},
-        "Condition": lambda stats: stats["AttackWidth"] == 15  
-    },
-    {
-        "Name": "Wildboy of Risk + 50 AD (if AL < 30)",
-        "Stats": {"AttackDamage": 50},
-        "Condition": lambda stats: stats["AttackLength"] < 30 
-    },
-    {
-        "Name": "Wildboy of Dashydashy +.9 DC (if A = 0)",
-        "Stats": {"DashCooldown": -0.9},
-        "Condition": lambda stats: stats["Armor"] == 0  
-    },
-    {
-        "Name": "Wildboy of Pancake + 200 AL & AW (if H < 25) ",
-        "Stats": {"AttackLength": 200, "AttackWidth": 200},
-        "Condition": lambda stats: stats["Health"] < 25 
-    },
-    {
-        "Name": "Wildboy of Sloth + 20 AD + 5 A (if AS < .8)",
-        "Stats": {"AttackDamage": 20, "Armor": 5},
-        "Condition": lambda stats: stats["AttackSpeed"] < 0.8  # Boost if DashCooldown < 2
-    },
-]
-
-
-# Player stats initialized as a copy of the default stats
-player_stats = DEFAULT_PLAYER_STATS.copy()
-
-# Player inventory
-inventory = {
-    "Weapons": [],
-    "Armor": []
-}
-equipment = {
-    "Weapons": [],
-    "Armor": [],
-    "Wildboys": []
-}
-
 # Generate a tier 1 weapon and equip it at the start of the game
-def initialize_player_with_weapon():
-    global inventory, equipment
+def initialize_player_with_weapon(state):
     tier = 0  # Starting with a tier 1 weapon
-    weapon = generate_equipment(tier, "Weapon")  # Generate a tier 1 weapon
-    equipment["Weapons"].append(weapon)  # Equip the weapon
-
-# Call this function after initializing the player's stats
-initialize_player_with_weapon()
+    weapon = generate_equipment(tier, "Weapon", state.rng.loot)  # Generate a tier 1 weapon
+    state.equipment["Weapons"].append(weapon)  # Equip the weapon
+    invalidate_stats(state)
+    invalidate_inventory_layout(state)
+
+# Simulation rate. update_game() always advances by a fixed step; the window's
+# frame rate only decides how many steps run per frame (see main()).
+SIM_HZ = 60
+# MovementSpeed and enemy speed are pixels per 1/60 s. Movement is scaled by
+# SPEED_SCALE * dt, so every tick rate covers the same ground per second.
+SPEED_SCALE = 60
+MAX_FRAME_TIME = 0.25  # Longest frame the window catches up on, in seconds
+
+def subpixel_step(remainder, distance):
+    """
+    Splits a movement into whole pixels, carrying the fraction to the next tick
+    so slow movers and high tick rates don't lose distance to truncation.
+    :param remainder: The fraction carried over from the last tick.
+    :param distance: Pixels to move this tick.
+    :return: (whole pixels to move now, new remainder)
+    """
+    total = distance + remainder
+    pixels = int(total)
+    return pixels, total - pixels
 
-# DASH FEATURE: Initialize dash-related variables
-dashing = False
-dash_start_time = 0
-last_dash_time = 0
+# DASH FEATURE: dash parameters
 dash_invuln_duration = 0.2  # Duration of invulnerability in seconds during dash
-# Variables for incremental dash movement
-dash_direction = pygame.math.Vector2(0, 0)  # Direction vector for the dash
-dash_distance_remaining = 0
 dash_speed = 2000  # Pixels per second; adjust as needed for dash speed
 
-
-# Attack parameters
-final_stats = calculate_final_stats()
-attack_cooldown = 1.0 / final_stats["AttackSpeed"]
-last_attack_time = 0
-sword_hitbox = None  # Will store the sword rect when attacking
-
 # Room parameters
 ROOM_WIDTH, ROOM_HEIGHT = 800, 600
 WALL_THICKNESS = 20
 EXIT_WIDTH = 100
 EXIT_HEIGHT = 20
 
-player_size = 20
-player_rect = pygame.Rect(0, 0, player_size, player_size)
-
-walls = []
-room_id = 0
+# Cell size of the enemy navigation grid in pixels
+NAV_CELL_SIZE = 20
 
-enemies = []
+# Crowd separation: share of their overlap two enemies resolve per second (capped
+# at half per tick), and how many overlapping neighbours an enemy reacts to
+SEPARATION_RATE = 30.0
+SEPARATION_MAX_NEIGHBOURS = 8
+# Offsets of a grid cell and the 8 cells around it
+GRID_NEIGHBOURHOOD = tuple((gx, gy) for gx in (-1, 0, 1) for gy in (-1, 0, 1))
 
+player_size = 20
 
 # Damage timing
 damage_cooldown = 0.5
-last_damage_time = time.time()
 
-game_over = False
-font = pygame.font.SysFont(None, 48)
+# Rendering: whether the next frame repaints the whole window, plus the regions
+# drawn last frame that have to be restored from the room background
+full_redraw = True
+last_dirty_rects = []
 
 def draw_stats(surface, stats, font, x, y):
-    """Draw player stats at the specified (x, y) position."""
+    """
+    Draw player stats at the specified (x, y) position.
+    :return: The list of rects that were drawn to.
+    """
     spacing = 20  # Space between lines
+    drawn = []
     for i, (key, value) in enumerate(stats.items()):
         stat_text = f"{key}: {value}"
-        text_surface = font.render(stat_text, True, (255, 255, 255))  # White text
-        surface.blit(text_surface, (x, y + i * spacing))
+        text_surface = text_cache.render(font, stat_text, (255, 255, 255))  # White text
+        drawn.append(surface.blit(text_surface, (x, y + i * spacing)))
+    return drawn
 
-def get_tier(room_id):
-    if room_id < 10:  # Tier 1 (Rooms 1–9)
-        return 1
-    return ((room_id - 1) // 10) + 1  # Tiers 2+ (Rooms 10–19, 20–29, etc.)
+def roll_enemies(tier, walls, rand):
+    """
+    Rolls a room's enemies and places them on the free floor.
+    :param walls: The room's walls and obstacles; enemies never overlap them.
+    :param rand: The random source, e.g. a session's rng.spawn stream.
+    :return: A list of Enemy objects.
+    """
+    ranges = get_enemy_ranges_for_tier(tier)
+    num_enemies = rand.randint(*ranges["count"])
 
-def get_enemy_ranges_for_tier(tier):
-    capped_tier = min(tier, 10)
-    
-    health_ranges = [(10,20),(20,30),(30,40),(40,50),(50,60),(60,70),(70,80),(80,90),(90,100),(100,120)]
-    speed_ranges = [(1,2),(2,3),(3,4),(4,5),(5,6),(6,7),(7,8),(8,9),(9,10),(10,12)]
-    damage_ranges = [(5,10),(10,15),(15,20),(20,25),(25,30),(30,35),(35,40),(40,45),(45,50),(50,60)]
-    size_ranges = [(20,30),(25,35),(30,40),(35,45),(40,50),(45,55),(50,60),(55,65),(60,70),(65,75)]
-    enemy_behavior_ranges = [(0,1),(0,1),(1,2),(1,2),(2,3),(2,3),(3,4),(3,4),(4,5),(4,5)]
-    enemy_count_ranges = [(2,4),(3,5),(4,6),(5,7),(6,8),(7,9),(8,10),(9,11),(10,12),(12,15)]
-    
-    return {
-        "health": health_ranges[capped_tier-1],
-        "speed": speed_ranges[capped_tier-1],
-        "damage": damage_ranges[capped_tier-1],
-        "size": size_ranges[capped_tier-1],
-        "behavior": enemy_behavior_ranges[capped_tier-1],
-        "count": enemy_count_ranges[capped_tier-1]
-    }
+    # Enemies keep 30 px clear of the outer walls
+    margin = WALL_THICKNESS + 30
+    space = FreeSpace(pygame.Rect((WIDTH - ROOM_WIDTH)//2 + margin, (HEIGHT - ROOM_HEIGHT)//2 + margin,
+                                  ROOM_WIDTH - 2 * margin, ROOM_HEIGHT - 2 * margin),
+                      min_size=ranges["size"][0])
+    for w in walls:
+        space.occupy(w)
 
-def spawn_enemies(tier):
-    global enemies
     enemies = []
-    ranges = get_enemy_ranges_for_tier(tier)
-    num_enemies = random.randint(*ranges["count"])
-    
     for _ in range(num_enemies):
-        placed = False
-        attempts = 0
-        while not placed and attempts < 100:
-            enemy_x = random.randint((WIDTH - ROOM_WIDTH)//2 + WALL_THICKNESS + 30,
-                                     (WIDTH + ROOM_WIDTH)//2 - WALL_THICKNESS - 30)
-            enemy_y = random.randint((HEIGHT - ROOM_HEIGHT)//2 + WALL_THICKNESS + 30,
-                                     (HEIGHT + ROOM_HEIGHT)//2 - WALL_THICKNESS - 30)
-            new_rect = pygame.Rect(enemy_x, enemy_y, 10, 10) # temporary, will resize
-            
-            if not any(new_rect.colliderect(w) for w in walls):
-                health = random.randint(*ranges["health"])
-                speed = random.uniform(*ranges["speed"])
-                damage = random.randint(*ranges["damage"])
-                enemy_behavior = random.uniform(*ranges["behavior"])
-                size_val = random.randint(*ranges["size"])
-                new_rect.width = size_val
-                new_rect.height = size_val
-                if not any(new_rect.colliderect(e["rect"]) for e in enemies):
-                    enemies.append({
-                        "rect": new_rect,
-                        "health": health,
-                        "max_health": health,  # Track the maximum health
-                        "speed": speed,
-                        "damage": damage,
-                        "behavior": enemy_behavior,
-                        "weapon": {  # Add randomized weapon stats
-                            "attack_damage": random.randint(5, 15) * get_tier(room_id),
-                            "attack_speed": random.uniform(0.5, 1.5),
-                            "attack_size": random.uniform(1.0, 2.0)
-                        },
-                        "last_attack_time": 0  # Cooldown timer for the enemy's weapon attacks
-                    })
-                    placed = True
-            attempts += 1
-
-def spawn_boss(tier):
-    """
-    Spawns a boss enemy with stats 4x the normal range of the given tier.
-    """
-    global enemies
+        health = rand.randint(*ranges["health"])
+        speed = rand.uniform(*ranges["speed"])
+        damage = rand.randint(*ranges["damage"])
+        enemy_behavior = rand.uniform(*ranges["behavior"])
+        size_val = rand.randint(*ranges["size"])
+        new_rect = space.place(size_val, size_val, rand)
+        if new_rect is None:
+            continue  # No free spot left for an enemy this size
+        enemies.append(Enemy(
+            rect=new_rect,
+            health=health,
+            max_health=health,  # Track the maximum health
+            speed=speed,
+            damage=damage,
+            behavior=enemy_behavior,
+            weapon=EnemyWeapon(  # Add randomized weapon stats
+                attack_damage=rand.randint(5, 15) * tier,
+                attack_speed=rand.uniform(0.5, 1.5),
+                attack_size=rand.uniform(1.0, 2.0)
+            ),
+            last_attack_time=-math.inf  # Cooldown timer for the enemy's weapon attacks
+        ))
+    return enemies
+
+def roll_boss(tier, rand):
+    """
+    Rolls a boss enemy with stats 4x the normal range of the given tier.
+    """
     ranges = get_enemy_ranges_for_tier(tier)
     
-    enemy_behavior = random.uniform(*ranges["behavior"])
+    enemy_behavior = rand.uniform(*ranges["behavior"])
+    health = rand.randint(ranges["health"][0] * 4, ranges["health"][1] * 4)
     
-    boss = {
-        "rect": pygame.Rect(WIDTH // 2 - 30, HEIGHT // 2 - 30, 60, 60),  # Larger boss size
-        "health": random.randint(ranges["health"][0] * 4, ranges["health"][1] * 4),
-        "max_health": random.randint(ranges["health"][0] * 4, ranges["health"][1] * 4),
-        "speed": random.uniform(ranges["speed"][0] * 1, ranges["speed"][1] * 1),  # Bosses are slower
-        "damage": random.randint(ranges["damage"][0] * 4, ranges["damage"][1] * 4),
-        "behavior": enemy_behavior,
-        "weapon": {
-            "attack_damage": random.randint(15, 30) * tier,
-            "attack_speed": random.uniform(0.5, 1.0),  # Slower attacks
-            "attack_size": random.uniform(2.0, 4.0)  # Larger attack range
-        },
-        "last_attack_time": 0,  # Initialize attack timer
-    }
-    enemies.append(boss)
-
-
-def create_room():
+    return Enemy(
+        rect=pygame.Rect(WIDTH // 2 - 30, HEIGHT // 2 - 30, 60, 60),  # Larger boss size
+        health=health,
+        max_health=health,  # Bosses start at full health
+        speed=rand.uniform(ranges["speed"][0] * 1, ranges["speed"][1] * 1),  # Bosses are slower
+        damage=rand.randint(ranges["damage"][0] * 4, ranges["damage"][1] * 4),
+        behavior=enemy_behavior,
+        weapon=EnemyWeapon(
+            attack_damage=rand.randint(15, 30) * tier,
+            attack_speed=rand.uniform(0.5, 1.0),  # Slower attacks
+            attack_size=rand.uniform(2.0, 4.0)  # Larger attack range
+        ),
+        last_attack_time=-math.inf,  # Initialize attack timer
+    )
+
+
+def create_room(rand):
+    """
+    Builds the outer walls with the exit gap and up to 5 obstacles.
+    :param rand: The random source, e.g. a session's rng.layout stream.
+    :return: A list of wall rects.
+    """
     w = []
     left_wall = pygame.Rect((WIDTH - ROOM_WIDTH)//2, (HEIGHT - ROOM_HEIGHT)//2, WALL_THICKNESS, ROOM_HEIGHT)
     right_wall = pygame.Rect((WIDTH + ROOM_WIDTH)//2 - WALL_THICKNESS, (HEIGHT - ROOM_HEIGHT)//2, WALL_THICKNESS, ROOM_HEIGHT)
@@ -436,7 +314,6 @@ def create_room():
     w.extend([left_wall, right_wall, top_wall, bottom_wall])
     
     exit_x = (WIDTH - EXIT_WIDTH)//2
-    exit_y = (HEIGHT - ROOM_HEIGHT)//2
     w.remove(top_wall)
     if exit_x > top_wall.x:
         top_wall_left = pygame.Rect(top_wall.x, top_wall.y, exit_x - top_wall.x, WALL_THICKNESS)
@@ -444,84 +321,155 @@ def create_room():
         w.append(top_wall_left)
         w.append(top_wall_right)
     
+    # Obstacles go left or right of the central corridor and keep 50 px clear of
+    # the top and bottom walls
     corridor_left = (WIDTH // 2) - 50
     corridor_right = (WIDTH // 2) + 50
+    inner_left = (WIDTH - ROOM_WIDTH)//2 + WALL_THICKNESS
+    inner_right = (WIDTH + ROOM_WIDTH)//2 - WALL_THICKNESS
+    band_top = (HEIGHT - ROOM_HEIGHT)//2 + WALL_THICKNESS + 50
+    band_height = ROOM_HEIGHT - 2 * (WALL_THICKNESS + 50)
+    space = FreeSpace((inner_left, band_top, corridor_left - inner_left, band_height),
+                      (corridor_right + 1, band_top, inner_right - corridor_right - 1, band_height),
+                      min_size=40)
     
     for _ in range(5):
-        obs_width = random.randint(40, 80)
-        obs_height = random.randint(40, 80)
-        
-        placed = False
-        attempts = 0
-        while not placed and attempts < 50:
-            obs_x = random.randint((WIDTH - ROOM_WIDTH)//2 + WALL_THICKNESS, (WIDTH + ROOM_WIDTH)//2 - WALL_THICKNESS - obs_width)
-            obs_y = random.randint((HEIGHT - ROOM_HEIGHT)//2 + WALL_THICKNESS + 50, (HEIGHT + ROOM_HEIGHT)//2 - WALL_THICKNESS - obs_height - 50)
-            
-            if obs_x < corridor_left - obs_width or obs_x > corridor_right:
-                new_obs = pygame.Rect(obs_x, obs_y, obs_width, obs_height)
-                if not any(new_obs.colliderect(x) for x in w):
-                    w.append(new_obs)
-                    placed = True
-            attempts += 1
+        obs_width = rand.randint(40, 80)
+        obs_height = rand.randint(40, 80)
+        new_obs = space.place(obs_width, obs_height, rand)
+        if new_obs is not None:
+            w.append(new_obs)
     
     return w
 
+def generate_layout(tier, boss, rand, spawn_rand=None):
+    """
+    Generates a room's walls and enemies.
+    :param boss: Spawn the tier's boss instead of regular enemies.
+    :param rand: Random source for the walls (and the enemies, without spawn_rand).
+    :param spawn_rand: Optional separate random source for the enemies.
+    :return: (walls, enemies)
+    """
+    walls = create_room(rand)
+    spawn_rand = spawn_rand or rand
+    enemies = [roll_boss(tier, spawn_rand)] if boss else roll_enemies(tier, walls, spawn_rand)
+    return walls, enemies
+
+def make_layout_pool(per_tier=32, seed=0):
+    """Creates a LayoutPool of this game's rooms that sessions can share (see new_game())."""
+    return LayoutPool(generate_layout, per_tier, seed)
 
-def new_room():
-    global walls, room_id, chest_rect, chest_spawned, chest_opened, COLOR_BG, COLOR_WALL, health_fountain_rect, fountain_spawned, fountain_used, fountain_should_spawn, levelgate_rect, levelgate_spawned, levelgate_used, levelgate_should_spawn
 
-    # Reset room elements
-    walls = create_room()
-    room_id += 1
+def roll_room(state, room_id):
+    """
+    Generates a room's walls and enemies, indexes them and rasterizes the walls
+    into the room's navigation grid. Only the session's layout and spawn streams are
+    used, so this can run on the room generator thread while the current room is played.
+    :return: (walls, enemies, wall index, enemy index, flow field)
+    """
     tier = get_tier(room_id)
-    chest_rect = None
-    chest_spawned = False
-    chest_opened = False
+    boss = room_id % 10 == 0  # Every 10th room is a boss room
+    if state.layout_pool is not None:
+        walls, enemies = state.layout_pool.take(tier, boss, state.rng.layout)
+    else:
+        walls, enemies = generate_layout(tier, boss, state.rng.layout, state.rng.spawn)
+    wall_index = SpatialHash()
+    for w in walls:
+        wall_index.insert(w, w)
+    enemy_index = SpatialHash()
+    for e in enemies:
+        enemy_index.insert(e, e.rect)
+    # Routes keep half the largest enemy clear of the walls
+    clearance = max((max(e.rect.size) // 2 for e in enemies), default=0)
+    nav = FlowField(nav_grid(pygame.Rect(0, 0, WIDTH, HEIGHT), walls, NAV_CELL_SIZE, clearance))
+    return walls, enemies, wall_index, enemy_index, nav
+
+# Single background thread shared by every session that pre-generates its rooms
+room_executor = None
+
+def prefetch_next_room(state):
+    """Starts generating the room after the current one on the room generator thread."""
+    global room_executor
+    if room_executor is None:
+        room_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="room-generator")
+    state.next_room = room_executor.submit(roll_room, state, state.room_id + 1)
+
+def discard_next_room(state):
+    """Drops a pre-generated room, waiting for the generator if it is still using the random streams."""
+    if state.next_room is not None:
+        if not state.next_room.cancel():
+            state.next_room.result()
+        state.next_room = None
+
+def new_room(state):
+
+    # Reset room elements, swapping in the pre-generated room if there is one
+    state.room_id += 1
+    tier = get_tier(state.room_id)
+    boss = state.room_id % 10 == 0
+    if state.next_room is not None:
+        room = state.next_room.result()  # Only blocks if the room isn't finished yet
+        state.next_room = None
+    else:
+        room = roll_room(state, state.room_id)
+    state.walls, state.enemies, state.wall_index, state.enemy_index, state.nav = room
+    state.room_log.append({
+        "room": state.room_id,
+        "tier": tier,
+        "boss": boss,
+        "entered_at": state.game_time,
+        "damage_taken": 0,
+        "time_to_clear": None,  # Seconds until the last enemy died
+        "loot_tiers": [],
+    })
+    log_event(state, "room", tier=tier, boss=boss, enemies=len(state.enemies))
+    state.chest_rect = None
+    state.chest_spawned = False
+    state.chest_opened = False
 
     # Reset health fountain for non-boss rooms
-    if room_id % 10 != 0:  # Not a boss room
-        health_fountain_rect = None
-        fountain_spawned = False
-        fountain_used = False  # Reset fountain state
-        levelgate_rect = None
-        levelgate_spawned = False
-        levelgate_used = False  # Reset fountain state
-    elif room_id % 10 == 0 and fountain_should_spawn:  # Boss room and fountain allowed
-        health_fountain_rect = pygame.Rect(WIDTH // 2 - 20, (HEIGHT // 2 + ROOM_HEIGHT // 4) - 20, 40, 40)
-        fountain_spawned = True
-        fountain_used = False  # Reset fountain state for the new boss room
-    elif room_id % 10 == 0 and levelgate_should_spawn:  # Boss room and fountain allowed
-        levelgate_rect = pygame.Rect(
+    if state.room_id % 10 != 0:  # Not a boss room
+        state.health_fountain_rect = None
+        state.fountain_spawned = False
+        state.fountain_used = False  # Reset fountain state
+        state.levelgate_rect = None
+        state.levelgate_spawned = False
+        state.levelgate_used = False  # Reset fountain state
+    elif state.room_id % 10 == 0 and state.fountain_should_spawn:  # Boss room and fountain allowed
+        state.health_fountain_rect = pygame.Rect(WIDTH // 2 - 20, (HEIGHT // 2 + ROOM_HEIGHT // 4) - 20, 40, 40)
+        state.fountain_spawned = True
+        state.fountain_used = False  # Reset fountain state for the new boss room
+    elif state.room_id % 10 == 0 and state.levelgate_should_spawn:  # Boss room and fountain allowed
+        state.levelgate_rect = pygame.Rect(
             (WIDTH - EXIT_WIDTH) // 2,  # Position level gate to align with the horizontal exit
             (HEIGHT - ROOM_HEIGHT) // 2,  # Position level gate at the top exit area
             EXIT_WIDTH,
             WALL_THICKNESS  # Same thickness as the wall
         )
-        levelgate_spawned = True
-        levelgate_used = False  # Reset fountain state
+        state.levelgate_spawned = True
+        state.levelgate_used = False  # Reset fountain state
         
-    # Spawn enemies
-    if room_id % 10 == 0:  # Check if this is the 10th room (boss room)
-        spawn_boss(tier)
+    if state.use_vectorized_enemies:
+        state.enemy_store = EnemyStore(state.enemies, state.walls, seed=state.rng.ai.getrandbits(32))
     else:
-        spawn_enemies(tier)
+        state.enemy_store = None
 
     # Update room colors based on tier
     colors = get_room_colors(tier)
-    COLOR_BG = colors["bg"]
-    COLOR_WALL = colors["wall"]
+    state.color_bg = colors["bg"]
+    state.color_wall = colors["wall"]
+    state.room_background = None  # Re-baked with the new walls and colors on the next draw
 
-def show_level_up_screen():
+    if state.prefetch_rooms:
+        prefetch_next_room(state)
+
+def build_level_up_layout(state, selected_wildboys):
     """
-    Displays the level-up screen where the player can pick a 'wildboy' or exit.
+    Lays out the level-up screen where the player can pick a 'wildboy' or exit.
     Includes a stats box positioned higher to ensure visibility of all text.
+    :param selected_wildboys: The Wildboys on offer.
+    :return: A ui.Layout; the options carry ("wildboy", Wildboy or None for "Exit") actions.
     """
-    running_level_up = True
-    font_title = pygame.font.SysFont(None, 64)
-    font_subtitle = pygame.font.SysFont(None, 36)
-    font_option = pygame.font.SysFont(None, 48)
-    font_stats = pygame.font.SysFont(None, 24)  # Smaller font for stats
-
     # Colors and layout
     bg_color = (50, 50, 100)
     text_color = (255, 255, 255)
@@ -529,597 +477,678 @@ def show_level_up_screen():
     box_color = (30, 30, 60)
     border_color = (255, 255, 255)
 
-    # Select three random Wildboys
-    selected_wildboys = select_random_wildboys()
-    options = [wildboy["Name"] for wildboy in selected_wildboys] + ["Exit"]
+    options = [(wildboy.name, wildboy) for wildboy in selected_wildboys] + [("Exit", None)]
 
     # Adjusted stats box position and size
-    stats_box_width = 250
-    stats_box_height = 200
-    stats_box_x = 20
-    stats_box_y = HEIGHT - stats_box_height - 60
-
-    while running_level_up:
-        WIN.fill(bg_color)
-
-        # Draw title
-        title_text = font_title.render("LEVEL UP!", True, text_color)
-        title_rect = title_text.get_rect(center=(WIDTH // 2, 100))
-        WIN.blit(title_text, title_rect)
-
-        # Draw subtitle
-        subtitle_text = font_subtitle.render("Pick a wildboy (permanent stat boost):", True, text_color)
-        subtitle_rect = subtitle_text.get_rect(center=(WIDTH // 2, 160))
-        WIN.blit(subtitle_text, subtitle_rect)
-
-        # Draw options and handle hover effects
-        mx, my = pygame.mouse.get_pos()
-        option_rects = []
-
-        for i, option in enumerate(options):
-            option_text = font_option.render(option, True, text_color)
-            option_rect = option_text.get_rect(center=(WIDTH // 2, 220 + i * 60))
-            option_rects.append(option_rect)
-            WIN.blit(option_text, option_rect)
-
-            # Highlight on hover
-            if option_rect.collidepoint(mx, my):
-                pygame.draw.rect(WIN, hover_color, option_rect.inflate(10, 10), border_radius=5)
-                WIN.blit(font_option.render(option, True, bg_color), option_rect)
-
-        # Draw stats box higher to show all stats
-        pygame.draw.rect(WIN, box_color, (stats_box_x, stats_box_y, stats_box_width, stats_box_height))
-        pygame.draw.rect(WIN, border_color, (stats_box_x, stats_box_y, stats_box_width, stats_box_height), 2)
-
-        stats_title = font_subtitle.render("Player Stats", True, text_color)
-        WIN.blit(stats_title, (stats_box_x + 10, stats_box_y + 10))
-
-        # Align stats text neatly inside the box
-        line_spacing = 20
-        max_stats_lines = (stats_box_height - 40) // line_spacing  # Max number of lines that fit
-        for i, (stat_name, stat_value) in enumerate(player_stats.items()):
-            if i >= max_stats_lines:
-                break  # Stop if exceeding the box height
-            stat_text = font_stats.render(f"{stat_name}: {stat_value}", True, text_color)
-            WIN.blit(stat_text, (stats_box_x + 10, stats_box_y + 40 + i * line_spacing))
-
-        pygame.display.flip()
-
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # Left click
-                    for i, rect in enumerate(option_rects):
-                        if rect.collidepoint(mx, my):
-                            if options[i] == "Exit":
-                                running_level_up = False  # Exit the level-up screen
-                            else:
-                                # Add the selected Wildboy to equipment
-                                selected_wildboy = selected_wildboys[i]
-                                equipment["Wildboys"].append(selected_wildboy)
-                                print(f"You selected {selected_wildboy['Name']}!")  # Debug output
-                                running_level_up = False  # Exit after selection
-
-
-def reset_game():
-    global player_stats, room_id, walls, enemies, player_rect, game_over, last_damage_time, last_attack_time, inventory, equipment, chest_spawned, chest_opened, chest_item, fountain_spawned, fountain_used, levelgate_spawned, levelgate_used, levelgate_rect, health_fountain_rect
+    stats_box = pygame.Rect(20, HEIGHT - 200 - 60, 250, 200)
+
+    widgets = [
+        Box((0, 0, WIDTH, HEIGHT), bg_color),
+        Label("LEVEL UP!", 64, text_color, center=(WIDTH // 2, 100)),
+        Label("Pick a wildboy (permanent stat boost):", 36, text_color, center=(WIDTH // 2, 160)),
+    ]
+    # Options, highlighted on hover
+    for i, (name, wildboy) in enumerate(options):
+        widgets.append(Label(name, 48, text_color, center=(WIDTH // 2, 220 + i * 60), action=("wildboy", wildboy),
+                             hover_color=hover_color, hover_text_color=bg_color))
+
+    # Stats box higher to show all stats
+    widgets.append(Box(stats_box, box_color))
+    widgets.append(Box(stats_box, border_color, border=2))
+    widgets.append(Label("Player Stats", 36, text_color, topleft=(stats_box.x + 10, stats_box.y + 10)))
+
+    # Align stats text neatly inside the box
+    line_spacing = 20
+    max_stats_lines = (stats_box.height - 40) // line_spacing  # Max number of lines that fit
+    for i, (stat_name, stat_value) in enumerate(state.player_stats.items()):
+        if i >= max_stats_lines:
+            break  # Stop if exceeding the box height
+        widgets.append(Label(f"{stat_name}: {stat_value}", 24, text_color, topleft=(stats_box.x + 10, stats_box.y + 40 + i * line_spacing)))
+
+    return Layout(Widget((0, 0, WIDTH, HEIGHT), widgets))
+
+def get_level_up_layout(state):
+    """Returns the layout of the pending level-up offer, building it when the screen opens."""
+    if state.level_up_layout is None:
+        state.level_up_layout = build_level_up_layout(state, state.pending_level_up)
+    return state.level_up_layout
+
+def draw_level_up_screen(state, hover=None):
+    """
+    Draws the level-up screen.
+    :param hover: The option widget under the mouse (see ui.Layout.hit()), highlighted.
+    """
+    get_level_up_layout(state).draw(WIN, hover=hover)
+
+
+def resolve_level_up(state, wildboy):
+    """
+    Closes a pending level-up offer.
+    :param wildboy: The chosen Wildboy, or None to take nothing.
+    """
+    if state.recorder is not None:
+        state.recorder.record_action(("wildboy", -1 if wildboy is None else state.pending_level_up.index(wildboy)))
+    state.pending_level_up = None
+    state.level_up_layout = None
+    if wildboy is not None:
+        # Add the selected Wildboy to equipment
+        state.equipment["Wildboys"].append(wildboy)
+        invalidate_stats(state)
+        invalidate_inventory_layout(state)
+    log_event(state, "wildboy_pick", wildboy=None if wildboy is None else wildboy.name)
+
+
+def reset_game(state, seed=None):
+    """
+    Starts a new run.
+    :param state: The session to reset.
+    :param seed: Run seed for the random streams; None picks a fresh one.
+    """
+    discard_next_room(state)
+    state.rng.reseed(seed)
+    if state.recorder is not None:
+        state.recorder.record_action(("reset", state.rng.seed))
 
     # Reset player stats to default
-    player_stats = DEFAULT_PLAYER_STATS.copy()
+    state.player_stats = DEFAULT_PLAYER_STATS.copy()
     
     # Reset inventory and equipment
-    inventory = {
+    state.inventory = {
         "Weapons": [],
         "Armor": []
     }
-    equipment = {
+    state.equipment = {
         "Weapons": [],
-        "Armor": []
+        "Armor": [],
+        "Wildboys": []
     }
+    invalidate_stats(state)
     
     # Equip starter weapon
-    initialize_player_with_weapon()
+    initialize_player_with_weapon(state)
 
     # Reset room state
-    room_id = 0
-    walls = []
-    enemies = []
-    chest_spawned = False
-    chest_opened = False
-    chest_item = None
-    health_fountain_rect = None
-    fountain_spawned = False
-    fountain_used = False
-    levelgate_rect = None
-    levelgate_spawned = False
-    levelgate_used = False
+    state.room_id = 0
+    state.room_log.clear()
+    state.walls = []
+    state.enemies = []
+    state.enemy_index.clear()
+    state.nav = None
+    state.chest_spawned = False
+    state.chest_opened = False
+    state.chest_item = None
+    state.chest_interacted = False
+    state.health_fountain_rect = None
+    state.fountain_spawned = False
+    state.fountain_used = False
+    state.levelgate_rect = None
+    state.levelgate_spawned = False
+    state.levelgate_used = False
+    state.pending_level_up = None
+    state.level_up_layout = None
 
     # Reset game state variables
-    game_over = False
-    last_damage_time = time.time()
-    last_attack_time = 0
+    state.game_over = False
+    state.game_time = 0.0
+    state.timers.clear(state.game_time)
+    state.attack_ready = True
+    state.dashing = False
+    state.dash_distance_remaining = 0
+    state.dash_ready = True
+    state.invulnerable = False
+    state.invulnerability_timer = None
+    state.sword_hitbox = None
+    # No contact damage in the first damage_cooldown seconds of a run
+    start_cooldown(state, "contact_damage_ready", damage_cooldown)
+
+    log_event(state, "run_start", vectorized=state.use_vectorized_enemies)
 
     # Generate the first room
-    new_room()
+    new_room(state)
     
     # Place player in the starting position
-    player_rect.centerx = WIDTH // 2
-    player_rect.bottom = (HEIGHT + ROOM_HEIGHT) // 2 - WALL_THICKNESS - 10
+    state.player_rect = pygame.Rect(0, 0, player_size, player_size)
+    state.player_rect.centerx = WIDTH // 2
+    state.player_rect.bottom = (HEIGHT + ROOM_HEIGHT) // 2 - WALL_THICKNESS - 10
+    state.player_subpixel = [0.0, 0.0]
 
-# Initial room
-new_room()
-player_rect.centerx = WIDTH//2
-player_rect.bottom = (HEIGHT + ROOM_HEIGHT)//2 - WALL_THICKNESS - 10
+def new_game(seed=None, vectorized=False, layout_pool=None, prefetch_rooms=False, events=None):
+    """
+    Creates a session and starts its first run.
+    :param seed: Run seed; None picks a fresh one.
+    :param vectorized: Use the NumPy enemy update path.
+    :param layout_pool: Optional LayoutPool (see make_layout_pool()) to draw rooms from.
+    :param prefetch_rooms: Generate each next room in the background while the current
+                           one is played (see prefetch_next_room()).
+    :param events: Optional EventLog to record the session's gameplay events to.
+    :return: The new GameState.
+    """
+    state = GameState(seed, vectorized)
+    state.events = events
+    state.layout_pool = layout_pool
+    state.prefetch_rooms = prefetch_rooms
+    reset_game(state, seed)
+    return state
 
-clock = pygame.time.Clock()
-running = True
-show_inventory = False  # Track inventory display state
 
-while running:
-    dt = clock.tick(60) / 1000.0
-    current_time = time.time()
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-    
-        # Toggle inventory display on 'F' key press
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
-            show_inventory = not show_inventory
-            
-        # Handle mouse click for inventory interaction
-        if event.type == pygame.MOUSEBUTTONDOWN and show_inventory:
-            if event.button == 1:  # Left click
-                mx, my = pygame.mouse.get_pos()
-                handle_inventory_click(mx, my)
-        
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            final_stats = calculate_final_stats()  # Ensure final stats are up to date
-            if current_time > last_dash_time + final_stats["DashCooldown"]:
-                # DASH FEATURE: Initiate dash
-                # Determine dash direction from the player's last movement input
-                dash_dir = pygame.math.Vector2(0, 0)
-                if keys[pygame.K_w]:
-                    dash_dir.y -= 1
-                if keys[pygame.K_s]:
-                    dash_dir.y += 1
-                if keys[pygame.K_a]:
-                    dash_dir.x -= 1
-                if keys[pygame.K_d]:
-                    dash_dir.x += 1
-                
-                # If no direction keys were pressed, default dash direction upward
-                if dash_dir.length() == 0:
-                    dash_dir.y = -1
-                
-                dash_dir = dash_dir.normalize()
-                
-                # Set dash variables for incremental movement
-                dashing = True
-                dash_direction = dash_dir
-                dash_distance_remaining = final_stats["DashDistance"]
-                dash_start_time = current_time
-                last_dash_time = current_time                
-   
-    if game_over:
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_r]:
-            reset_game()
-        # Draw Game Over Screen
-        WIN.fill(COLOR_BG)
-        game_over_text = font.render("Game Over! Press R to Restart", True, COLOR_GAME_OVER)
-        rect = game_over_text.get_rect(center=(WIDTH//2, HEIGHT//2))
-        WIN.blit(game_over_text, rect)
-        pygame.display.flip()
-        continue
-   
+def empty_controls():
+    """
+    Returns an input snapshot with nothing pressed.
+    update_game() reads its input only from these snapshots, so they can come from
+    the keyboard and mouse, a script or a bot.
+    """
+    return {
+        "up": False,
+        "down": False,
+        "left": False,
+        "right": False,
+        "attack": False,    # Left mouse button held
+        "aim": (0, 0),      # Mouse position the attack is aimed at
+        "dash": False,      # Dash pressed this tick
+        "interact": False,  # E held
+    }
 
-  
-    def render_wrapped_text(surface, text, font, color, x, y, max_width):
-        words = text.split(' ')
-        line = ""
-        height = y
-        for word in words:
-            test_line = line + word + " "
-            if font.size(test_line)[0] > max_width:
-                render = font.render(line, True, color)
-                surface.blit(render, (x, height))
-                height += font.get_linesize()
-                line = word + " "
-            else:
-                line = test_line
-        if line:
-            render = font.render(line, True, color)
-            surface.blit(render, (x, height))
-    
-    def handle_inventory_click(mx, my):
-        global inventory, equipment
-
-        inventory_x = 20
-        inventory_y = 20
-        inventory_width = WIDTH // 2 - 40
-        inventory_height = HEIGHT - 40
-        max_items = 3
-        weapon_spacing = (inventory_height // 2 - 60) // max_items
-        armor_spacing = (inventory_height // 2 - 60) // max_items
-        delete_mode = pygame.key.get_pressed()[pygame.K_LSHIFT]  # Check if Shift key is held
-        
-        # Detect clicks on Weapons in Inventory
-        # Use the same rect as in the drawing code
-        for i, weapon in enumerate(inventory["Weapons"]):
-            weapon_rect = pygame.Rect(inventory_x + 10, inventory_y + 80 + i * weapon_spacing, inventory_width - 20, weapon_spacing - 10)
-            if weapon_rect.collidepoint(mx, my):
-                if delete_mode:
-                    # Delete weapon permanently
-                    print(f"Deleting {weapon['Name']} from inventory.")
-                    inventory["Weapons"].remove(weapon)
-                else:
-                    # Equip weapon
-                    if weapon in inventory["Weapons"]:
-                        if equipment["Weapons"]:
-                            unequipped = equipment["Weapons"].pop()
-                            inventory["Weapons"].append(unequipped)
-                        inventory["Weapons"].remove(weapon)
-                        equipment["Weapons"].append(weapon)
-                return
-
-        # Detect clicks on Armor in Inventory
-        # Use the same rect as in the drawing code
-        inventory_armor_start_y = inventory_y + inventory_height // 2 + 30
-        for i, armor in enumerate(inventory["Armor"]):
-            armor_rect = pygame.Rect(inventory_x + 10, inventory_armor_start_y + 30 + i * armor_spacing, inventory_width - 20, armor_spacing - 10)
-            if armor_rect.collidepoint(mx, my):
-                if delete_mode:
-                    # Delete armor permanently
-                    print(f"Deleting {armor['Name']} from inventory.")
-                    inventory["Armor"].remove(armor)
-                else:
-                    # Equip armor
-                    if armor in inventory["Armor"]:
-                        if equipment["Armor"]:
-                            unequipped = equipment["Armor"].pop()
-                            inventory["Armor"].append(unequipped)
-                        inventory["Armor"].remove(armor)
-                        equipment["Armor"].append(armor)
-                return
-
-        # Detect clicks on Equipped Weapon
-        equipped_weapon_x = WIDTH // 2 + 30
-        equipped_weapon_y = 80
-        if equipment["Weapons"]:
-            equipped_weapon_rect = pygame.Rect(equipped_weapon_x, equipped_weapon_y, inventory_width - 20, 30)
-            if equipped_weapon_rect.collidepoint(mx, my):
-                # Unequip the weapon and add it back to inventory
-                unequipped_weapon = equipment["Weapons"].pop()
-                add_to_inventory(unequipped_weapon, "Weapons")
-                return
-
-        # Detect clicks on Equipped Armor
-        equipped_armor_y = (HEIGHT - 80) // 2 + 70
-        if equipment["Armor"]:
-            equipped_armor_rect = pygame.Rect(equipped_weapon_x, equipped_armor_y, inventory_width - 20, 30)
-            if equipped_armor_rect.collidepoint(mx, my):
-                # Unequip the armor and add it back to inventory
-                unequipped_armor = equipment["Armor"].pop()
-                add_to_inventory(unequipped_armor, "Armor")
-                return
-                
-    if show_inventory:
-        WIN.fill(COLOR_BG)  # Clear screen
-        font_title = pygame.font.SysFont(None, 36)
-        font_item = pygame.font.SysFont(None, 24)
-        delete_mode = pygame.key.get_pressed()[pygame.K_LSHIFT]  # Check if Shift key is held
-
-        # Left Side: Inventory
-        inventory_x = 20
-        inventory_y = 20
-        inventory_width = WIDTH // 2 - 40
-        inventory_height = HEIGHT - 40
-        pygame.draw.rect(WIN, (50, 50, 50), (inventory_x, inventory_y, inventory_width, inventory_height))
-
-        # Inventory Title
-        inventory_title = font_title.render("Inventory", True, (255, 255, 255))
-        WIN.blit(inventory_title, (inventory_x + 10, inventory_y + 10))
-
-        # Calculate dynamic spacing for items
-        max_items = 3  # Maximum number of weapons/armor
-        weapon_spacing = (inventory_height // 2 - 60) // max_items
-        armor_spacing = (inventory_height // 2 - 60) // max_items
-
-        # Display Weapons in Inventory
-        inventory_weapons_title = font_title.render("Weapons", True, (200, 200, 200))
-        WIN.blit(inventory_weapons_title, (inventory_x + 10, inventory_y + 50))
-        for i, weapon in enumerate(inventory["Weapons"]):
-            weapon_rect = pygame.Rect(inventory_x + 10, inventory_y + 80 + i * weapon_spacing, inventory_width - 20, weapon_spacing - 10)
-            weapon_color = (255, 0, 0) if delete_mode else (200, 200, 200)  # Red background in delete mode
-            pygame.draw.rect(WIN, weapon_color, weapon_rect)
-            weapon_text = f"{weapon['Name']} - Stats: {weapon['Stats']}"
-            render_wrapped_text(WIN, weapon_text, font_item, (0, 0, 0), weapon_rect.x + 5, weapon_rect.y + 5, weapon_rect.width - 10)
-
-        # Display Armor in Inventory
-        inventory_armor_title = font_title.render("Armor", True, (200, 200, 200))
-        inventory_armor_start_y = inventory_y + inventory_height // 2 + 30
-        WIN.blit(inventory_armor_title, (inventory_x + 10, inventory_armor_start_y))
-        for i, armor in enumerate(inventory["Armor"]):
-            armor_rect = pygame.Rect(inventory_x + 10, inventory_armor_start_y + 30 + i * armor_spacing, inventory_width - 20, armor_spacing - 10)
-            armor_color = (255, 0, 0) if delete_mode else (200, 200, 200)  # Red background in delete mode
-            pygame.draw.rect(WIN, armor_color, armor_rect)
-            armor_text = f"{armor['Name']} - Stats: {armor['Stats']}"
-            render_wrapped_text(WIN, armor_text, font_item, (0, 0, 0), armor_rect.x + 5, armor_rect.y + 5, armor_rect.width - 10)
-
-        # Right Side: Equipment
-        equipment_x = WIDTH // 2 + 20
-        equipment_y = 20
-        equipment_width = WIDTH // 2 - 40
-        equipment_height = inventory_height
-        pygame.draw.rect(WIN, (50, 50, 50), (equipment_x, equipment_y, equipment_width, equipment_height))
-
-        # Equipment Title
-        equipment_title = font_title.render("Equipment", True, (255, 255, 255))
-        WIN.blit(equipment_title, (equipment_x + 10, equipment_y + 10))
-
-        # Define consistent spacing between sections
-        section_spacing = 100  # Spacing between equipment sections
-
-        # Display Weapon Slot
-        weapon_slot_title = font_title.render("Weapon", True, (200, 200, 200))
-        weapon_slot_y = equipment_y + 50
-        WIN.blit(weapon_slot_title, (equipment_x + 10, weapon_slot_y))
-        if equipment["Weapons"]:
-            equipped_weapon = equipment["Weapons"][0]
-            weapon_text = f"{equipped_weapon['Name']} - Stats: {equipped_weapon['Stats']}"
-            render_wrapped_text(WIN, weapon_text, font_item, (200, 200, 200), equipment_x + 10, weapon_slot_y + 30, equipment_width - 20)
+def read_controls(dash_pressed):
+    """Builds the controls snapshot from the real keyboard and mouse."""
+    keys = pygame.key.get_pressed()
+    controls = empty_controls()
+    controls["up"] = keys[pygame.K_w]
+    controls["down"] = keys[pygame.K_s]
+    controls["left"] = keys[pygame.K_a]
+    controls["right"] = keys[pygame.K_d]
+    controls["attack"] = pygame.mouse.get_pressed()[0]
+    controls["aim"] = pygame.mouse.get_pos()
+    controls["dash"] = dash_pressed
+    controls["interact"] = keys[pygame.K_e]
+    return controls
+
+def can_move(state, rect, x_off, y_off):
+    test_rect = rect.copy()
+    test_rect.x += x_off
+    test_rect.y += y_off
+    if state.wall_index.collides(test_rect):
+        return False
+    return True
+
+def equip_item(state, item_type, item):
+    """
+    Equips an item from the inventory, moving the currently equipped one back.
+    :param item_type: 'Weapons' or 'Armor'.
+    """
+    if item in state.inventory[item_type]:
+        if state.recorder is not None:
+            state.recorder.record_action(("equip", item_type, state.inventory[item_type].index(item)))
+        if state.equipment[item_type]:
+            unequipped = state.equipment[item_type].pop()
+            state.inventory[item_type].append(unequipped)
+        state.inventory[item_type].remove(item)
+        state.equipment[item_type].append(item)
+        invalidate_stats(state)
+        invalidate_inventory_layout(state)
+        log_event(state, "equip", item_type=item_type, item=item.name, stats=item.stats)
+
+def unequip_item(state, item_type):
+    """Moves the equipped item of the given type back to the inventory."""
+    if state.recorder is not None:
+        state.recorder.record_action(("unequip", item_type))
+    unequipped = state.equipment[item_type].pop()
+    add_to_inventory(state, unequipped, item_type)
+    invalidate_stats(state)
+    invalidate_inventory_layout(state)
+    log_event(state, "unequip", item_type=item_type, item=unequipped.name)
+
+def delete_item(state, item_type, item):
+    """Deletes an item from the inventory permanently."""
+    if state.recorder is not None:
+        state.recorder.record_action(("delete", item_type, state.inventory[item_type].index(item)))
+    log_event(state, "delete", item_type=item_type, item=item.name)
+    state.inventory[item_type].remove(item)
+    invalidate_inventory_layout(state)
+
+def handle_inventory_click(state, mx, my, delete_mode=False):
+    """
+    Equips (or in delete mode deletes) a clicked inventory item, or unequips a
+    clicked equipped item. Hit-tests against the rects the screen was drawn with.
+    """
+    widget = get_inventory_layout(state).hit((mx, my))
+    if widget is None:
+        return
+    name, item_type, *item = widget.action
+    if name == "inventory":
+        if delete_mode:
+            delete_item(state, item_type, item[0])
         else:
-            empty_weapon_text = font_item.render("None", True, (100, 100, 100))
-            WIN.blit(empty_weapon_text, (equipment_x + 10, weapon_slot_y + 30))
-
-        # Display Armor Slot
-        armor_slot_title = font_title.render("Armor", True, (200, 200, 200))
-        armor_slot_y = weapon_slot_y + section_spacing
-        WIN.blit(armor_slot_title, (equipment_x + 10, armor_slot_y))
-        if equipment["Armor"]:
-            equipped_armor = equipment["Armor"][0]
-            armor_text = f"{equipped_armor['Name']} - Stats: {equipped_armor['Stats']}"
-            render_wrapped_text(WIN, armor_text, font_item, (200, 200, 200), equipment_x + 10, armor_slot_y + 30, equipment_width - 20)
+            equip_item(state, item_type, item[0])
+    elif name == "equipped":
+        # Unequip the item and add it back to inventory
+        unequip_item(state, item_type)
+
+def start_cooldown(state, flag, duration):
+    """
+    Clears one of the session's ready flags (e.g. "dash_ready") and schedules the
+    timer that sets it again after `duration` seconds of game time.
+    """
+    setattr(state, flag, False)
+    state.timers.schedule(duration, setattr, state, flag, True)
+
+def end_invulnerability(state):
+    state.invulnerable = False
+    if state.invulnerability_timer is not None:
+        state.invulnerability_timer.cancel()
+        state.invulnerability_timer = None
+
+def end_swing(e, sword_rect):
+    """Stops drawing an enemy's swing, unless it has swung again since."""
+    if e.sword_rect is sword_rect:
+        e.sword_rect = None
+
+def enemy_ready(e):
+    e.attack_ready = True
+
+def enemy_attack(state, e, current_time):
+    """
+    Swings an enemy's sword toward the player and applies the hit.
+    The caller has already checked range and cooldown.
+    """
+    ex, ey = e.rect.center
+    px, py = state.player_rect.center
+
+    # Determine attack direction
+    dir_x = px - ex
+    dir_y = py - ey
+
+    # Calculate direction: right, left, up, or down
+    if abs(dir_x) > abs(dir_y):  # Horizontal swing
+        if dir_x > 0:
+            direction = "right"
         else:
-            empty_armor_text = font_item.render("None", True, (100, 100, 100))
-            WIN.blit(empty_armor_text, (equipment_x + 10, armor_slot_y + 30))
-
-        # Display Wildboys Slot
-        wildboys_slot_title = font_title.render("Wildboys", True, (200, 200, 200))
-        wildboys_slot_y = armor_slot_y + section_spacing
-        WIN.blit(wildboys_slot_title, (equipment_x + 10, wildboys_slot_y))
-        if equipment["Wildboys"]:
-            wildboy_spacing = 30  # Spacing between Wildboy entries
-            for i, wildboy in enumerate(equipment["Wildboys"]):
-                wildboy_text = f"{wildboy['Name']}"
-                render_wrapped_text(WIN, wildboy_text, font_item, (200, 200, 200),
-                                    equipment_x + 10,
-                                    wildboys_slot_y + 30 + i * wildboy_spacing,
-                                    equipment_width - 20)
+            direction = "left"
+    else:  # Vertical swing
+        if dir_y > 0:
+            direction = "down"
         else:
-            empty_wildboys_text = font_item.render("None", True, (100, 100, 100))
-            WIN.blit(empty_wildboys_text, (equipment_x + 10, wildboys_slot_y + 30))
+            direction = "up"
+
+    # Create sword hitbox
+    sword_length = 20 * e.weapon.attack_size
+    sword_width = 10 * e.weapon.attack_size
+    enemy_sword_rect = pygame.Rect(0, 0, sword_length, sword_width)
+
+    # Position sword hitbox based on direction
+    if direction == "right":
+        enemy_sword_rect.midleft = e.rect.midright
+    elif direction == "left":
+        enemy_sword_rect.midright = e.rect.midleft
+    elif direction == "up":
+        enemy_sword_rect.width, enemy_sword_rect.height = sword_width, sword_length
+        enemy_sword_rect.midbottom = e.rect.midtop
+    elif direction == "down":
+        enemy_sword_rect.width, enemy_sword_rect.height = sword_width, sword_length
+        enemy_sword_rect.midtop = e.rect.midbottom
+
+    # Store the sword rect and end the swing animation after 0.2 s
+    e.sword_rect = enemy_sword_rect
+    state.timers.schedule(0.2, end_swing, e, enemy_sword_rect)
+
+    # Check for collision with the player
+    if enemy_sword_rect.colliderect(state.player_rect):
+        if not state.invulnerable:
+            # Apply damage only if the player is not invulnerable
+            calculate_final_stats(state, damage=e.weapon.attack_damage, source="sword")
+
+    # Start the attack cooldown; the vectorized path keeps its own timers
+    e.last_attack_time = current_time
+    if state.enemy_store is None:
+        e.attack_ready = False
+        state.timers.schedule(1 / e.weapon.attack_speed, enemy_ready, e)
+
+def move_enemy(state, e, dx, dy):
+    """
+    Moves an enemy by (dx, dy) pixels, carrying fractions between ticks. If the
+    whole move ends up in a wall, the enemy slides: it keeps the x part of the
+    move if that is free, else the y part, else it stays put.
+    """
+    old_pos = e.rect.topleft
+    step_x, remainder_x = subpixel_step(e.remainder_x, dx)
+    step_y, remainder_y = subpixel_step(e.remainder_y, dy)
+    e.rect.x += step_x
+    e.rect.y += step_y
+
+    if state.wall_index.collides(e.rect):
+        e.rect.topleft = (old_pos[0] + step_x, old_pos[1])
+        if step_x and not state.wall_index.collides(e.rect):
+            e.remainder_x, e.remainder_y = remainder_x, 0.0
+            state.enemy_index.move(e)
+        else:
+            e.rect.topleft = (old_pos[0], old_pos[1] + step_y)
+            if step_y and not state.wall_index.collides(e.rect):
+                e.remainder_x, e.remainder_y = 0.0, remainder_y
+                state.enemy_index.move(e)
+            else:
+                e.rect.topleft = old_pos
+                e.remainder_x = e.remainder_y = 0.0
+    else:
+        e.remainder_x = remainder_x
+        e.remainder_y = remainder_y
+        state.enemy_index.move(e)
+
+def update_enemies(state, current_time, dt):
+    """
+    Moves each enemy toward the player and lets it attack when in range. Enemies
+    head straight for the player unless the room's flow field routes them around a
+    wall, and slide along walls they run into.
+    """
+    scale = SPEED_SCALE * dt
+    px, py = state.player_rect.center
+    nav = state.nav
+    if nav is not None and state.enemies:
+        nav.set_target(px, py)  # The search itself only runs as far as direction_at() needs
+    for e in state.enemies:
+        ex, ey = e.rect.center
+        dir_x = px - ex
+        dir_y = py - ey
+        dist = (dir_x**2 + dir_y**2)**0.5
+        if dist != 0:
+            dir_x /= dist
+            dir_y /= dist
+        if nav is not None:
+            flow = nav.direction_at(ex, ey)
+            if flow is not None:  # The way to the player bends around a wall
+                dir_x, dir_y = flow
+    
+        erratic_x = state.rng.ai.uniform(-e.behavior, e.behavior)
+        erratic_y = state.rng.ai.uniform(-e.behavior, e.behavior)
+        dir_x += erratic_x
+        dir_y += erratic_y
+        dist2 = (dir_x**2 + dir_y**2)**0.5
+        if dist2 != 0:
+            dir_x /= dist2
+            dir_y /= dist2
+    
+        move_enemy(state, e, dir_x * e.speed * scale, dir_y * e.speed * scale)
+
+        # Enemy sword attack logic; enemies on cooldown are skipped until their timer fires
+        if not e.attack_ready:
+            continue
+
+        # Calculate distance to player
+        ex, ey = e.rect.center
+        distance_to_player = math.hypot(px - ex, py - ey)
+
+        # Check if player is close enough to be attacked
+        attack_range = 50 * e.weapon.attack_size  # Modify attack range based on weapon size
+
+        if distance_to_player <= attack_range:
+            enemy_attack(state, e, current_time)
+
+def separate_enemies(state, dt):
+    """
+    Pushes overlapping enemies apart so they don't stack into one blob. Enemies are
+    treated as circles of half their size and bucketed by center into a grid
+    rebuilt every tick, with cells as large as the largest enemy. An enemy then
+    only checks the 3x3 cells around its own, and reacts to at most
+    SEPARATION_MAX_NEIGHBOURS of them, so a tick costs about O(n). Pushes are
+    worked out from the positions at the start of the stage, then applied like
+    movement (walls still block them).
+    """
+    fraction = min(0.5, SEPARATION_RATE * dt)
+    if state.enemy_store is not None:
+        moved = state.enemy_store.separate(fraction, SEPARATION_MAX_NEIGHBOURS)
+        store_enemies = state.enemy_store.enemies
+        xs = state.enemy_store.x.tolist()
+        ys = state.enemy_store.y.tolist()
+        for i in moved.tolist():
+            e = store_enemies[i]
+            e.rect.topleft = (xs[i], ys[i])
+            state.enemy_index.move(e)
+        return
+
+    enemies = state.enemies
+    if len(enemies) < 2:
+        return
+    circles = [(e.rect.centerx, e.rect.centery, max(e.rect.size) / 2) for e in enemies]
+    cell_size = max(1, int(2 * max(r for _, _, r in circles)))
+    grid = {}  # (cell x, cell y) -> indices into enemies
+    for i, (x, y, _) in enumerate(circles):
+        grid.setdefault((x // cell_size, y // cell_size), []).append(i)
+
+    pushes = []
+    for i, (x, y, radius) in enumerate(circles):
+        cell_x, cell_y = x // cell_size, y // cell_size
+        push_x = push_y = 0.0
+        neighbours = 0
+        for gx, gy in GRID_NEIGHBOURHOOD:
+            for j in grid.get((cell_x + gx, cell_y + gy), ()):
+                other_x, other_y, other_radius = circles[j]
+                dx = x - other_x
+                dy = y - other_y
+                dist_sq = dx * dx + dy * dy
+                reach = radius + other_radius
+                # Exactly stacked enemies (and the enemy itself) are skipped; jitter splits them
+                if 0 < dist_sq < reach * reach:
+                    dist = dist_sq ** 0.5
+                    # Each of the two takes half of the overlap
+                    push = (reach - dist) / 2 / dist
+                    push_x += dx * push
+                    push_y += dy * push
+                    neighbours += 1
+                    if neighbours == SEPARATION_MAX_NEIGHBOURS:
+                        break
+            if neighbours == SEPARATION_MAX_NEIGHBOURS:
+                break
+        if neighbours:
+            pushes.append((enemies[i], push_x * fraction, push_y * fraction))
+    for e, dx, dy in pushes:
+        move_enemy(state, e, dx, dy)
+
+def update_enemies_vectorized(state, current_time, dt):
+    """
+    Same as update_enemies(), but movement, distance, range and cooldown checks
+    run as batched array operations on enemy_store.
+    """
+    if state.nav is not None and state.enemies:
+        state.nav.set_target(*state.player_rect.center)
+    moved, attacking = state.enemy_store.step(state.player_rect.center, current_time, SPEED_SCALE * dt, state.nav)
+    xs = state.enemy_store.x.tolist()
+    ys = state.enemy_store.y.tolist()
+    store_enemies = state.enemy_store.enemies
+    for i in moved.tolist():
+        e = store_enemies[i]
+        e.rect.topleft = (xs[i], ys[i])
+        state.enemy_index.move(e)
+    for i in attacking.tolist():
+        enemy_attack(state, store_enemies[i], current_time)
+
+def update_game(state, dt, controls):
+    """
+    Advances the simulation by one tick: player movement and dash, chest, fountain
+    and level gate interaction, enemy AI, combat, the death check and room
+    transitions. Nothing is drawn and no pygame input is read, so this also runs
+    without a window.
+    :param dt: Seconds of game time to advance.
+    :param controls: The input snapshot for this tick (see empty_controls()).
+    """
+
+    if state.recorder is not None:
+        state.recorder.record_tick(dt, controls)
+    state.game_time += dt
+    current_time = state.game_time
+    profiler = state.profiler
+    state.timers.advance(current_time)  # Ends the cooldowns and windows that ran out
+
+    final_stats = calculate_final_stats(state)
+    if controls["dash"] and state.dash_ready:
+        # DASH FEATURE: Initiate dash
+        # Determine dash direction from the player's movement input
+        dash_dir = pygame.math.Vector2(0, 0)
+        if controls["up"]:
+            dash_dir.y -= 1
+        if controls["down"]:
+            dash_dir.y += 1
+        if controls["left"]:
+            dash_dir.x -= 1
+        if controls["right"]:
+            dash_dir.x += 1
+        
+        # If no direction keys were pressed, default dash direction upward
+        if dash_dir.length() == 0:
+            dash_dir.y = -1
         
-        pygame.display.flip()
-        continue
+        dash_dir = dash_dir.normalize()
+        
+        # Set dash variables for incremental movement
+        state.dashing = True
+        state.dash_direction = dash_dir
+        state.dash_distance_remaining = final_stats["DashDistance"]
+        start_cooldown(state, "dash_ready", final_stats["DashCooldown"])
+        end_invulnerability(state)
+        state.invulnerable = True
+        state.invulnerability_timer = state.timers.schedule(dash_invuln_duration, end_invulnerability, state)
 
     # Player input
-    keys = pygame.key.get_pressed()
-    mouse_buttons = pygame.mouse.get_pressed()
-    mx, my = pygame.mouse.get_pos()
-    final_stats = calculate_final_stats()
-    move_speed = final_stats["MovementSpeed"]
+    mx, my = controls["aim"]
+    move_speed = final_stats["MovementSpeed"] * (SPEED_SCALE * dt)
     dx = dy = 0
-    if keys[pygame.K_w]:
+    if controls["up"]:
         dy = -move_speed
-    if keys[pygame.K_s]:
+    if controls["down"]:
         dy = move_speed
-    if keys[pygame.K_a]:
+    if controls["left"]:
         dx = -move_speed
-    if keys[pygame.K_d]:
+    if controls["right"]:
         dx = move_speed
     
     # Move player (no enemy collision check)
-    def can_move(rect, x_off, y_off):
-        test_rect = rect.copy()
-        test_rect.x += x_off
-        test_rect.y += y_off
-        if any(test_rect.colliderect(w) for w in walls):
-            return False
-        return True
-    
-    if can_move(player_rect, dx, 0):
-        player_rect.x += dx
-    if can_move(player_rect, 0, dy):
-        player_rect.y += dy
+    step_x, state.player_subpixel[0] = subpixel_step(state.player_subpixel[0], dx)
+    if can_move(state, state.player_rect, step_x, 0):
+        state.player_rect.x += step_x
+    else:
+        state.player_subpixel[0] = 0.0
+    step_y, state.player_subpixel[1] = subpixel_step(state.player_subpixel[1], dy)
+    if can_move(state, state.player_rect, 0, step_y):
+        state.player_rect.y += step_y
+    else:
+        state.player_subpixel[1] = 0.0
     
     # Handle incremental dash movement
-    if dashing:
+    if state.dashing:
         # Calculate movement for this frame
-        movement = dash_direction * dash_speed * dt
+        movement = state.dash_direction * dash_speed * dt
         movement_length = movement.length()
 
         # Ensure we don't overshoot the remaining dash distance
-        if movement_length > dash_distance_remaining:
-            movement = dash_direction * dash_distance_remaining
-            movement_length = dash_distance_remaining
+        if movement_length > state.dash_distance_remaining:
+            movement = state.dash_direction * state.dash_distance_remaining
+            movement_length = state.dash_distance_remaining
 
-        # Attempt to move horizontally
+        # Attempt to move horizontally, carrying the fraction like normal movement
         if movement.x != 0:
-            player_rect.x += int(movement.x)
-            if any(player_rect.colliderect(w) for w in walls):
+            step_x, remainder_x = subpixel_step(state.player_subpixel[0], movement.x)
+            state.player_rect.x += step_x
+            if state.wall_index.collides(state.player_rect):
                 # Collision detected, revert horizontal movement
-                player_rect.x -= int(movement.x)
-                dashing = False
-                dash_distance_remaining = 0
+                state.player_rect.x -= step_x
+                state.player_subpixel[0] = 0.0
+                state.dashing = False
+                state.dash_distance_remaining = 0
             else:
-                dash_distance_remaining -= abs(movement.x)
+                state.player_subpixel[0] = remainder_x
+                state.dash_distance_remaining -= abs(movement.x)
 
         # Attempt to move vertically
-        if movement.y != 0 and dashing:
-            player_rect.y += int(movement.y)
-            if any(player_rect.colliderect(w) for w in walls):
+        if movement.y != 0 and state.dashing:
+            step_y, remainder_y = subpixel_step(state.player_subpixel[1], movement.y)
+            state.player_rect.y += step_y
+            if state.wall_index.collides(state.player_rect):
                 # Collision detected, revert vertical movement
-                player_rect.y -= int(movement.y)
-                dashing = False
-                dash_distance_remaining = 0
+                state.player_rect.y -= step_y
+                state.player_subpixel[1] = 0.0
+                state.dashing = False
+                state.dash_distance_remaining = 0
             else:
-                dash_distance_remaining -= abs(movement.y)
+                state.player_subpixel[1] = remainder_y
+                state.dash_distance_remaining -= abs(movement.y)
 
         # Check if dash is complete
-        if dash_distance_remaining <= 0:
-            dashing = False
+        if state.dash_distance_remaining <= 0:
+            state.dashing = False
+        if not state.dashing:
+            end_invulnerability(state)  # The window only covers the dash itself
+    if profiler is not None:
+        profiler.lap("player_move")
     
     # Check if player opens the chest
-    if chest_rect and player_rect.colliderect(chest_rect):
-        if keys[pygame.K_e] and not chest_interacted:  # Only interact if key is newly pressed
+    if state.chest_rect and state.player_rect.colliderect(state.chest_rect):
+        if controls["interact"] and not state.chest_interacted:  # Only interact if key is newly pressed
             # Only proceed if the chest has not already been resolved
-            if not chest_opened:
+            if not state.chest_opened:
                 # Generate an item if the chest is empty
-                if chest_item is None:
-                    tier = get_tier(room_id)
-                    equipment_type = random.choice(["Weapon", "Armor"])  # Randomly pick type
-                    chest_item = generate_equipment(tier, equipment_type)
-                    print(f"A {chest_item['Name']} has appeared in the chest!")  # Debug log
+                if state.chest_item is None:
+                    tier = get_tier(state.room_id)
+                    equipment_type = state.rng.loot.choice(["Weapon", "Armor"])  # Randomly pick type
+                    state.chest_item = generate_equipment(tier, equipment_type, state.rng.loot)
+                    state.room_log[-1]["loot_tiers"].append(tier)
+                    log_event(state, "loot", tier=tier, item_type=equipment_type, item=state.chest_item.name, stats=state.chest_item.stats)
 
                 # Determine item type based on stats
-                equipment_type = "Weapons" if "AttackDamage" in chest_item["Stats"] else "Armor"
+                equipment_type = "Weapons" if "AttackDamage" in state.chest_item.stats else "Armor"
 
                 # Check if inventory has space
-                if (equipment_type == "Weapons" and len(inventory["Weapons"]) < 3) or (
-                    equipment_type == "Armor" and len(inventory["Armor"]) < 3
+                if (equipment_type == "Weapons" and len(state.inventory["Weapons"]) < 3) or (
+                    equipment_type == "Armor" and len(state.inventory["Armor"]) < 3
                 ):
-                    add_to_inventory(chest_item, equipment_type)
-                    print(f"You took the {chest_item['Name']} from the chest!")  # Notify player
-                    chest_item = None  # Clear the chest item
-                    chest_opened = True  # Mark chest as resolved
+                    add_to_inventory(state, state.chest_item, equipment_type)
+                    log_event(state, "pickup", item_type=equipment_type, item=state.chest_item.name)
+                    state.chest_item = None  # Clear the chest item
+                    state.chest_opened = True  # Mark chest as resolved
                 else:
-                    print(f"Your inventory is full! The {chest_item['Name']} remains in the chest.")
-            else:
-                print("The chest is empty or already opened.")  # Chest is resolved
+                    log_event(state, "inventory_full", item=state.chest_item.name)  # The item stays in the chest
 
-            chest_interacted = True  # Mark the interaction as handled
-        elif not keys[pygame.K_e]:  # Reset the flag when the key is released
-            chest_interacted = False    
+            state.chest_interacted = True  # Mark the interaction as handled
+        elif not controls["interact"]:  # Reset the flag when the key is released
+            state.chest_interacted = False    
     
     # Check if player interacts with the health fountain
-    if health_fountain_rect and player_rect.colliderect(health_fountain_rect) and not fountain_used:
-        if keys[pygame.K_e]:  # Interact with the fountain
-            final_stats = calculate_final_stats()  # Update player stats
-            player_stats["Health"] = final_stats["MaxHealth"]  # Fully restore health
-            fountain_used = True
-            fountain_should_spawn = False  # Disable spawning until the next boss room
-            print("You have restored your health!")  # Debug message
+    if state.health_fountain_rect and state.player_rect.colliderect(state.health_fountain_rect) and not state.fountain_used:
+        if controls["interact"]:  # Interact with the fountain
+            final_stats = calculate_final_stats(state)  # Update player stats
+            state.player_stats["Health"] = final_stats["MaxHealth"]  # Fully restore health
+            state.fountain_used = True
+            state.fountain_should_spawn = False  # Disable spawning until the next boss room
+            log_event(state, "fountain", health=state.player_stats["Health"])
             
         # Check if player interacts with the levelgate and then spawn levelup screen
-    if levelgate_rect and player_rect.colliderect(levelgate_rect) and not levelgate_used:
-            levelgate_used = True
-            levelgate_should_spawn = False  # Disable spawning until the next boss room
-            show_level_up_screen()
-            print("You have touched the level gate")  # Debug message
+    if state.levelgate_rect and state.player_rect.colliderect(state.levelgate_rect) and not state.levelgate_used:
+            state.levelgate_used = True
+            state.levelgate_should_spawn = False  # Disable spawning until the next boss room
+            state.pending_level_up = select_random_wildboys(state)  # Offered by the caller of update_game()
+            log_event(state, "level_gate", offers=[wildboy.name for wildboy in state.pending_level_up])
     
-    # Enemy movement (only blocked by walls)
-    for e in enemies:
-        ex, ey = e["rect"].center
-        px, py = player_rect.center
-        dir_x = px - ex
-        dir_y = py - ey
-        dist = (dir_x**2 + dir_y**2)**0.5
-        if dist != 0:
-            dir_x /= dist
-            dir_y /= dist
-    
-        erratic_x = random.uniform(-e["behavior"], e["behavior"])
-        erratic_y = random.uniform(-e["behavior"], e["behavior"])
-        dir_x += erratic_x
-        dir_y += erratic_y
-        dist2 = (dir_x**2 + dir_y**2)**0.5
-        if dist2 != 0:
-            dir_x /= dist2
-            dir_y /= dist2
-    
-        old_pos = e["rect"].topleft
-        e["rect"].x += int(dir_x * e["speed"])
-        e["rect"].y += int(dir_y * e["speed"])
-    
-        if any(e["rect"].colliderect(w) for w in walls):
-            e["rect"].topleft = old_pos
-
-        # Enemy sword attack logic
-        time_since_last_attack = current_time - e["last_attack_time"]
-
-        # Calculate distance to player
-        ex, ey = e["rect"].center
-        px, py = player_rect.center
-        distance_to_player = math.hypot(px - ex, py - ey)
-
-        # Check if player is close enough to be attacked
-        attack_range = 50 * e["weapon"]["attack_size"]  # Modify attack range based on weapon size
-
-        if distance_to_player <= attack_range and time_since_last_attack >= (1 / e["weapon"]["attack_speed"]):
-            # Determine attack direction
-            dir_x = px - ex
-            dir_y = py - ey
-
-            # Calculate direction: right, left, up, or down
-            if abs(dir_x) > abs(dir_y):  # Horizontal swing
-                if dir_x > 0:
-                    direction = "right"
-                else:
-                    direction = "left"
-            else:  # Vertical swing
-                if dir_y > 0:
-                    direction = "down"
-                else:
-                    direction = "up"
-
-            # Create sword hitbox
-            sword_length = 20 * e["weapon"]["attack_size"]
-            sword_width = 10 * e["weapon"]["attack_size"]
-            enemy_sword_rect = pygame.Rect(0, 0, sword_length, sword_width)
-
-            # Position sword hitbox based on direction
-            if direction == "right":
-                enemy_sword_rect.midleft = e["rect"].midright
-            elif direction == "left":
-                enemy_sword_rect.midright = e["rect"].midleft
-            elif direction == "up":
-                enemy_sword_rect.width, enemy_sword_rect.height = sword_width, sword_length
-                enemy_sword_rect.midbottom = e["rect"].midtop
-            elif direction == "down":
-                enemy_sword_rect.width, enemy_sword_rect.height = sword_width, sword_length
-                enemy_sword_rect.midtop = e["rect"].midbottom
-
-            # Store the sword rect and duration for the swing animation
-            e["sword_rect"] = enemy_sword_rect
-            e["swing_end_time"] = current_time + 0.2
+    if profiler is not None:
+        profiler.lap("interactions")
 
-            # Check for collision with the player
-            if enemy_sword_rect.colliderect(player_rect):
-                if not (dashing and (current_time - dash_start_time < dash_invuln_duration)):
-                    # Apply damage only if the player is not invulnerable
-                    final_stats = calculate_final_stats(damage=e["weapon"]["attack_damage"])
-
-            # Update attack cooldown
-            e["last_attack_time"] = current_time
+    # Enemy movement (only blocked by walls)
+    if state.enemy_store is not None:
+        update_enemies_vectorized(state, current_time, dt)
+    else:
+        update_enemies(state, current_time, dt)
+    if profiler is not None:
+        profiler.lap("enemy_ai")
+    separate_enemies(state, dt)
+    if profiler is not None:
+        profiler.lap("separation")
     
     # Player Attack
     # Determine direction from mouse position relative to player
-    px, py = player_rect.center
+    px, py = state.player_rect.center
     angle = math.degrees(math.atan2(my - py, mx - px))
     # Normalize angle to [0, 360)
     angle = angle % 360
     
     # If mouse button is held and cooldown passed, attack
-    if mouse_buttons[0]: # left mouse button
-        final_stats = calculate_final_stats()
-        attack_cooldown = 1.0 / final_stats["AttackSpeed"]
-        if current_time > last_attack_time + attack_cooldown:
+    if controls["attack"]: # left mouse button
+        final_stats = calculate_final_stats(state)
+        if state.attack_ready:
             # Attack
             # Determine direction: up, down, left, right
             # We'll pick the major direction based on angle:
@@ -1138,170 +1167,741 @@ while running:
             else:
                 direction = "up"
             
-            final_stats = calculate_final_stats()
             sword_length = final_stats["AttackLength"]
             sword_width = final_stats["AttackWidth"]
             
             # Position sword relative to player based on direction
             sword_rect = pygame.Rect(0, 0, sword_length, sword_width)
             if direction == "right":
-                sword_rect.midleft = (player_rect.right, player_rect.centery)
+                sword_rect.midleft = (state.player_rect.right, state.player_rect.centery)
             elif direction == "left":
-                sword_rect.midright = (player_rect.left, player_rect.centery)
+                sword_rect.midright = (state.player_rect.left, state.player_rect.centery)
             elif direction == "up":
                 # rotate dimensions so length is vertical
                 sword_rect.width, sword_rect.height = sword_width, sword_length
-                sword_rect.midbottom = (player_rect.centerx, player_rect.top)
+                sword_rect.midbottom = (state.player_rect.centerx, state.player_rect.top)
             elif direction == "down":
                 sword_rect.width, sword_rect.height = sword_width, sword_length
-                sword_rect.midtop = (player_rect.centerx, player_rect.bottom)
+                sword_rect.midtop = (state.player_rect.centerx, state.player_rect.bottom)
             
             # Check for enemy hits
-            for e in enemies:
-                if e["rect"].colliderect(sword_rect):
-                    final_stats = calculate_final_stats()
-                    e["health"] -= final_stats["AttackDamage"]
+            for e in state.enemy_index.query(sword_rect):
+                e.health -= final_stats["AttackDamage"]
+                if state.enemy_store is not None:
+                    state.enemy_store.hit(e, final_stats["AttackDamage"])
+                log_event(state, "damage_dealt", amount=final_stats["AttackDamage"], enemy_health=e.health)
         
            
-            last_attack_time = current_time
-            sword_hitbox = sword_rect.copy()
+            start_cooldown(state, "attack_ready", 1.0 / final_stats["AttackSpeed"])
+            state.sword_hitbox = sword_rect.copy()
         else:
             # currently on cooldown, no new attack
-            sword_hitbox = None
+            state.sword_hitbox = None
     else:
-        sword_hitbox = None
+        state.sword_hitbox = None
+    if profiler is not None:
+        profiler.lap("player_attack")
 
     # Damage application with Armor reduction (minimum 1 damage)
-    if dashing and (current_time - dash_start_time < dash_invuln_duration):
+    if state.invulnerable:
         # Skip damage while dashing
         touching_enemies = []
     else:
-        touching_enemies = [en for en in enemies if en["rect"].colliderect(player_rect)]
-        if touching_enemies and current_time > last_damage_time + damage_cooldown:
+        touching_enemies = state.enemy_index.query(state.player_rect)
+        if touching_enemies and state.contact_damage_ready:
             # Calculate the total damage from all touching enemies
-            total_damage = sum(en["damage"] for en in touching_enemies)
+            total_damage = sum(en.damage for en in touching_enemies)
 
             # Update player stats with the calculated damage
-            final_stats = calculate_final_stats(damage=total_damage)
+            final_stats = calculate_final_stats(state, damage=total_damage, source="contact")
 
-            # Update last damage time to enforce cooldown
-            last_damage_time = current_time
-        
-    # If player is dashing and within invuln window, skip damage:
-    if dashing and (current_time - dash_start_time < dash_invuln_duration):
-        # Skip damage while dashing
-        touching_enemies = []
+            # Enforce the damage cooldown
+            start_cooldown(state, "contact_damage_ready", damage_cooldown)
 
     # Update enemy list to remove dead enemies
-    enemies = [en for en in enemies if en["health"] > 0]
+    if state.enemy_store is not None:
+        for en in state.enemy_store.remove_dead():
+            state.enemy_index.remove(en)
+            log_event(state, "kill", max_health=en.max_health, damage=en.damage)
+        state.enemies = state.enemy_store.enemies
+    else:
+        for en in state.enemies:
+            if en.health <= 0:
+                state.enemy_index.remove(en)
+                log_event(state, "kill", max_health=en.max_health, damage=en.damage)
+        state.enemies = [en for en in state.enemies if en.health > 0]
 
     # Check if all enemies are dead and spawn the chest/health fountain if not already spawned
-    if not enemies and not chest_spawned:
-        chest_rect = pygame.Rect(WIDTH // 2 - 20, HEIGHT // 2 - 20, 40, 40)  # Spawn chest in the center
-        chest_spawned = True
+    if not state.enemies and not state.chest_spawned:
+        state.chest_rect = pygame.Rect(WIDTH // 2 - 20, HEIGHT // 2 - 20, 40, 40)  # Spawn chest in the center
+        state.chest_spawned = True
+        state.room_log[-1]["time_to_clear"] = state.game_time - state.room_log[-1]["entered_at"]
         
         # Spawn health fountain only in boss rooms (final room of each tier)
-        if room_id % 10 == 0 and not fountain_spawned:
-            health_fountain_rect = pygame.Rect(WIDTH // 2 - 20, (HEIGHT // 2 + ROOM_HEIGHT // 4) - 20, 40, 40)
-            fountain_spawned = True
-            fountain_used = False
+        if state.room_id % 10 == 0 and not state.fountain_spawned:
+            state.health_fountain_rect = pygame.Rect(WIDTH // 2 - 20, (HEIGHT // 2 + ROOM_HEIGHT // 4) - 20, 40, 40)
+            state.fountain_spawned = True
+            state.fountain_used = False
         else:
-            health_fountain_rect = None  # Remove the fountain from other rooms
+            state.health_fountain_rect = None  # Remove the fountain from other rooms
         
         # Spawn levelgate only in boss rooms (final room of each tier)
-        if room_id % 10 == 0 and not levelgate_spawned:
-            levelgate_rect = pygame.Rect(
+        if state.room_id % 10 == 0 and not state.levelgate_spawned:
+            state.levelgate_rect = pygame.Rect(
                 (WIDTH - EXIT_WIDTH) // 2,  # Position level gate to align with the horizontal exit
                 (HEIGHT - ROOM_HEIGHT) // 2,  # Position level gate at the top exit area
                 EXIT_WIDTH,
                 WALL_THICKNESS  # Same thickness as the wall
             )
-            levelgate_spawned = True
-            levelgate_used = False
+            state.levelgate_spawned = True
+            state.levelgate_used = False
         else:
-            levelgate_rect = None  # Remove the levelgate from other rooms
+            state.levelgate_rect = None  # Remove the levelgate from other rooms
 
 
 
     # Check if player died
-    final_stats = calculate_final_stats()
+    final_stats = calculate_final_stats(state)
     if final_stats["Health"] <= 0:
-        game_over = True
+        state.game_over = True
+        log_event(state, "death")
+    if profiler is not None:
+        profiler.lap("damage_cleanup")
 
     # Check if player reached exit
-    if player_rect.top < (HEIGHT - ROOM_HEIGHT)//2 + WALL_THICKNESS:
-        new_room()
-        player_rect.centerx = WIDTH//2
-        player_rect.bottom = (HEIGHT + ROOM_HEIGHT)//2 - WALL_THICKNESS - 10
+    if state.player_rect.top < (HEIGHT - ROOM_HEIGHT)//2 + WALL_THICKNESS:
+        new_room(state)
+        state.player_rect.centerx = WIDTH//2
+        state.player_rect.bottom = (HEIGHT + ROOM_HEIGHT)//2 - WALL_THICKNESS - 10
+        state.player_subpixel = [0.0, 0.0]
+        if profiler is not None:
+            profiler.lap("new_room")
+
+def build_inventory_layout(state):
+    """
+    Lays out the inventory and equipment screen.
+    :return: A ui.Layout. Inventory items carry ("inventory", item type, item)
+             actions and equipped items ("equipped", item type).
+    """
+    title_color = (255, 255, 255)
+    section_color = (200, 200, 200)
+    panel_color = (50, 50, 50)
+    empty_color = (100, 100, 100)
+
+    # Left Side: Inventory
+    inventory = pygame.Rect(20, 20, WIDTH // 2 - 40, HEIGHT - 40)
+    inventory_widgets = [
+        Label("Inventory", 36, title_color, topleft=(inventory.x + 10, inventory.y + 10)),
+    ]
 
-    # Draw
-    WIN.fill(COLOR_BG)
-    for w in walls:
-        pygame.draw.rect(WIN, COLOR_WALL, w)
-    
-    for e in enemies:
-        pygame.draw.rect(WIN, COLOR_ENEMY, e["rect"])
+    # Calculate dynamic spacing for items
+    max_items = 3  # Maximum number of weapons/armor
+    item_spacing = (inventory.height // 2 - 60) // max_items
+    sections = (("Weapons", inventory.y + 50), ("Armor", inventory.y + inventory.height // 2 + 30))
+    for item_type, section_y in sections:
+        inventory_widgets.append(Label(item_type, 36, section_color, topleft=(inventory.x + 10, section_y)))
+        for i, item in enumerate(state.inventory[item_type]):
+            item_rect = pygame.Rect(inventory.x + 10, section_y + 30 + i * item_spacing, inventory.width - 20, item_spacing - 10)
+            text = TextBlock(item_rect.inflate(-10, -10), f"{item.name} - Stats: {item.stats}", 24, (0, 0, 0))
+            # Red background in delete mode
+            inventory_widgets.append(Box(item_rect, section_color, [text], ("inventory", item_type, item), delete_color=(255, 0, 0)))
+
+    # Right Side: Equipment
+    equipment = pygame.Rect(WIDTH // 2 + 20, 20, WIDTH // 2 - 40, inventory.height)
+    equipment_widgets = [
+        Label("Equipment", 36, title_color, topleft=(equipment.x + 10, equipment.y + 10)),
+    ]
+
+    # Weapon, Armor and Wildboys slots with consistent spacing between sections
+    section_spacing = 100
+    for i, (item_type, title) in enumerate((("Weapons", "Weapon"), ("Armor", "Armor"), ("Wildboys", "Wildboys"))):
+        slot_y = equipment.y + 50 + i * section_spacing
+        equipment_widgets.append(Label(title, 36, section_color, topleft=(equipment.x + 10, slot_y)))
+        items = state.equipment[item_type]
+        if not items:
+            equipment_widgets.append(Label("None", 24, empty_color, topleft=(equipment.x + 10, slot_y + 30)))
+        elif item_type == "Wildboys":
+            wildboy_spacing = 30  # Spacing between Wildboy entries
+            for j, wildboy in enumerate(items):
+                equipment_widgets.append(TextBlock((equipment.x + 10, slot_y + 30 + j * wildboy_spacing, equipment.width - 20, wildboy_spacing),
+                                                   wildboy.name, 24, section_color))
+        else:
+            # Clicking the equipped item unequips it
+            equipment_widgets.append(TextBlock((equipment.x + 10, slot_y + 30, equipment.width - 20, section_spacing - 40),
+                                               f"{items[0].name} - Stats: {items[0].stats}", 24, section_color, ("equipped", item_type)))
+
+    return Layout(Widget((0, 0, WIDTH, HEIGHT), [
+        Box(inventory, panel_color, inventory_widgets),
+        Box(equipment, panel_color, equipment_widgets),
+    ]))
+
+def get_inventory_layout(state):
+    """Returns the laid-out inventory screen, building it again only after invalidate_inventory_layout()."""
+    if state.inventory_layout is None:
+        state.inventory_layout = build_inventory_layout(state)
+    return state.inventory_layout
+
+def draw_inventory(state, delete_mode=False):
+    """
+    Draws the inventory and equipment screen.
+    :param delete_mode: True while Shift is held, highlighting items for deletion.
+    """
+    WIN.fill(state.color_bg)  # Clear screen
+    get_inventory_layout(state).draw(WIN, delete_mode=delete_mode)
+
+def draw_game_over(state):
+    WIN.fill(state.color_bg)
+    game_over_text = text_cache.render(get_font(48), "Game Over! Press R to Restart", COLOR_GAME_OVER)
+    rect = game_over_text.get_rect(center=(WIDTH//2, HEIGHT//2))
+    WIN.blit(game_over_text, rect)
+
+def bake_room_background(state):
+    """
+    Pre-renders the floor and walls of the current room. They never change
+    within a room, so each frame starts from a copy of this surface.
+    """
+    background = pygame.Surface((WIDTH, HEIGHT))
+    if WIN is not None and pygame.display.get_init():  # Off-screen targets need no conversion
+        background = background.convert(WIN)
+    background.fill(state.color_bg)
+    for w in state.walls:
+        pygame.draw.rect(background, state.color_wall, w)
+    return background
+
+def snapshot_positions(state):
+    """
+    Records where the player and enemies are before a simulation step, so
+    draw_game() can interpolate between this and the next state.
+    :return: A dictionary of top-left positions keyed by id() of the entity.
+    """
+    positions = {id(e): e.rect.topleft for e in state.enemies}
+    positions[id(state.player_rect)] = state.player_rect.topleft
+    return positions
+
+def interpolate_rect(rect, key, previous, alpha):
+    """
+    Returns rect moved back toward its position in the previous snapshot.
+    :param alpha: 0 draws the previous state, 1 the current one.
+    """
+    if previous is None or alpha >= 1:
+        return rect
+    old = previous.get(key)
+    if old is None:
+        return rect
+    return rect.move(round((old[0] - rect.x) * (1 - alpha)), round((old[1] - rect.y) * (1 - alpha)))
+
+def draw_game(state, previous=None, alpha=1.0):
+    """
+    Draws the room, entities and HUD for the current simulation state.
+    Only the regions drawn this frame or last frame are touched; the rest of the
+    window still shows the cached room background.
+    :param previous: Positions from snapshot_positions() before the last step, or None.
+    :param alpha: How far the frame lies between the previous and the current step.
+    :return: The list of rects to pass to pygame.display.update().
+    """
+    global full_redraw, last_dirty_rects
+
+    # Baked lazily after new_room() so headless runs never pay for it
+    if state.room_background is None:
+        state.room_background = bake_room_background(state)
+        full_redraw = True
+
+    if full_redraw:
+        WIN.blit(state.room_background, (0, 0))
+    else:
+        # Erase last frame's dynamic layer
+        for rect in last_dirty_rects:
+            WIN.blit(state.room_background, rect, rect)
+
+    dirty = []
+    for e in state.enemies:
+        enemy_rect = interpolate_rect(e.rect, id(e), previous, alpha)
+        dirty.append(pygame.draw.rect(WIN, COLOR_ENEMY, enemy_rect))
 
         # Draw enemy health bar
-        health_bar_width = e["rect"].width
+        health_bar_width = enemy_rect.width
         health_bar_height = 5
-        health_ratio = e["health"] / e["max_health"]
-        health_bar_bg = pygame.Rect(e["rect"].x, e["rect"].y - health_bar_height - 2, health_bar_width, health_bar_height)
-        health_bar_fg = pygame.Rect(e["rect"].x, e["rect"].y - health_bar_height - 2, int(health_bar_width * health_ratio), health_bar_height)
-        pygame.draw.rect(WIN, COLOR_HEALTH_BG, health_bar_bg)
+        health_ratio = e.health / e.max_health
+        health_bar_bg = pygame.Rect(enemy_rect.x, enemy_rect.y - health_bar_height - 2, health_bar_width, health_bar_height)
+        health_bar_fg = pygame.Rect(enemy_rect.x, enemy_rect.y - health_bar_height - 2, int(health_bar_width * health_ratio), health_bar_height)
+        dirty.append(pygame.draw.rect(WIN, COLOR_HEALTH_BG, health_bar_bg))
         pygame.draw.rect(WIN, COLOR_HEALTH, health_bar_fg)
 
         # Draw the enemy sword if attacking
-        if "sword_rect" in e and current_time < e["swing_end_time"]:
-            pygame.draw.rect(WIN, COLOR_SWORD, e["sword_rect"])
+        if e.sword_rect is not None:
+            dirty.append(pygame.draw.rect(WIN, COLOR_SWORD, e.sword_rect))
     
   
     # Draw the chest if spawned
-    if chest_rect:
-        pygame.draw.rect(WIN, COLOR_CHEST, chest_rect)
+    if state.chest_rect:
+        dirty.append(pygame.draw.rect(WIN, COLOR_CHEST, state.chest_rect))
         
         # Draw a smaller square inside to indicate it's opened
-        if chest_opened:
-            open_rect = chest_rect.inflate(-10, -10)  # Shrink the rect for the "opened" look
-            pygame.draw.rect(WIN, COLOR_BG, open_rect)  # Draw smaller square with the floor color
+        if state.chest_opened:
+            open_rect = state.chest_rect.inflate(-10, -10)  # Shrink the rect for the "opened" look
+            pygame.draw.rect(WIN, state.color_bg, open_rect)  # Draw smaller square with the floor color
 
     # Draw the health fountain if it exists
-    if health_fountain_rect:
-        pygame.draw.rect(WIN, COLOR_FOUNTAIN, health_fountain_rect)
+    if state.health_fountain_rect:
+        dirty.append(pygame.draw.rect(WIN, COLOR_FOUNTAIN, state.health_fountain_rect))
         
         # If used, draw an overlay to indicate the fountain is empty
-        if fountain_used:
-            used_overlay = health_fountain_rect.inflate(-10, -10)  # Slightly smaller overlay
-            pygame.draw.rect(WIN, COLOR_BG, used_overlay)  # Match background color
+        if state.fountain_used:
+            used_overlay = state.health_fountain_rect.inflate(-10, -10)  # Slightly smaller overlay
+            pygame.draw.rect(WIN, state.color_bg, used_overlay)  # Match background color
 
 
     # Draw player
-    pygame.draw.rect(WIN, COLOR_PLAYER, player_rect)
+    dirty.append(pygame.draw.rect(WIN, COLOR_PLAYER, interpolate_rect(state.player_rect, id(state.player_rect), previous, alpha)))
 
 
     # Draw sword hitbox if attacking
-    if sword_hitbox:
-        pygame.draw.rect(WIN, COLOR_SWORD, sword_hitbox)
+    if state.sword_hitbox:
+        dirty.append(pygame.draw.rect(WIN, COLOR_SWORD, state.sword_hitbox))
     
     # Draw health bar
     bar_width = 200
     bar_height = 20
-    final_stats = calculate_final_stats()
+    final_stats = calculate_final_stats(state)
     health_ratio = final_stats["Health"] / final_stats["MaxHealth"]
-    pygame.draw.rect(WIN, COLOR_HEALTH_BG, (10, 10, bar_width, bar_height))
+    dirty.append(pygame.draw.rect(WIN, COLOR_HEALTH_BG, (10, 10, bar_width, bar_height)))
     pygame.draw.rect(WIN, COLOR_HEALTH, (10, 10, int(bar_width * health_ratio), bar_height))
     
     # Draw stats display
-    font_stats = pygame.font.SysFont(None, 24)  # Smaller font for stats
-    final_stats = calculate_final_stats()
-    draw_stats(WIN, final_stats, font_stats, 10, 40)  # Position under the health bar in the top-left corner
+    font_stats = get_font(24)  # Smaller font for stats
+    dirty.extend(draw_stats(WIN, final_stats, font_stats, 10, 40))  # Position under the health bar in the top-left corner
     
     # Display the room number
-    font_room = pygame.font.SysFont(None, 36)  # Choose a font and size
-    room_text = font_room.render(f"Room #{room_id}", True, (255, 255, 255))  # White text
-    WIN.blit(room_text, (WIDTH - 150, 10))  # Position it in the top-right corner
-        
-    pygame.display.flip()
+    font_room = get_font(36)  # Choose a font and size
+    room_text = text_cache.render(font_room, f"Room #{state.room_id}", (255, 255, 255))  # White text
+    dirty.append(WIN.blit(room_text, (WIDTH - 150, 10)))  # Position it in the top-right corner
+
+    # Frame timings under the room number (toggled with F3)
+    if state.profiler is not None and state.profiler.show_overlay:
+        dirty.extend(state.profiler.draw_overlay(WIN, get_font(16, "monospace"), WIDTH - 390, 50))
+
+    if full_redraw:
+        updates = [WIN.get_rect()]
+        full_redraw = False
+    else:
+        updates = last_dirty_rects + dirty
+    last_dirty_rects = dirty
+    return updates
+
+def bot_item_score(item_type, item):
+    """How much the bot values an item when deciding what to equip or throw away."""
+    if item_type == "Weapons":
+        return item.stats["AttackDamage"]
+    return item.stats["Armor"] * 5 + item.stats["Health"]
+
+def bot_manage_inventory(state):
+    """Equips the bot's best item of each type and frees a slot when the inventory is full."""
+    for item_type in ("Weapons", "Armor"):
+        if not state.inventory[item_type]:
+            continue
+        best = max(state.inventory[item_type], key=lambda item: bot_item_score(item_type, item))
+        if not state.equipment[item_type] or bot_item_score(item_type, best) > bot_item_score(item_type, state.equipment[item_type][0]):
+            equip_item(state, item_type, best)
+        if len(state.inventory[item_type]) >= 3:
+            worst = min(state.inventory[item_type], key=lambda item: bot_item_score(item_type, item))
+            delete_item(state, item_type, worst)
+
+def bot_controls(state, tick):
+    """
+    A simple scripted player for headless runs. It fights the nearest enemy, loots
+    the chest, keeps its best gear equipped, uses the health fountain and then walks
+    to the exit, detouring around obstacles that block it.
+    :param tick: The simulation tick number.
+    :return: A controls snapshot.
+    """
+    if tick == 0:
+        state.bot_detour = None
+    bot_manage_inventory(state)
+
+    controls = empty_controls()
+    px, py = state.player_rect.center
+    target = None
+    if state.enemies:
+        nearest = min(state.enemies, key=lambda e: (e.rect.centerx - px) ** 2 + (e.rect.centery - py) ** 2)
+        target = nearest.rect.center
+        controls["attack"] = True
+        controls["aim"] = target
+    elif state.chest_rect and not state.chest_opened:
+        target = state.chest_rect.center
+        controls["interact"] = tick % 2 == 0  # Tap E so each press is a new interaction
+    elif state.health_fountain_rect and not state.fountain_used:
+        target = state.health_fountain_rect.center
+        controls["interact"] = True
+    else:
+        target = (WIDTH // 2, 0)  # Head for the exit
+
+    tx, ty = target
+    step_x = (tx > px + 2) - (tx < px - 2)
+    step_y = (ty > py + 2) - (ty < py - 2)
+    speed = calculate_final_stats(state)["MovementSpeed"]
+
+    if state.bot_detour is not None:
+        step_x, step_y, ticks_left = state.bot_detour
+        state.bot_detour = (step_x, step_y, ticks_left - 1) if ticks_left > 1 else None
+    elif (step_x or step_y) and speed > 0:
+        blocked_x = not step_x or not can_move(state, state.player_rect, step_x * speed, 0)
+        blocked_y = not step_y or not can_move(state, state.player_rect, 0, step_y * speed)
+        if blocked_x and blocked_y:
+            # No progress possible, go around the obstacle for a while
+            if step_y:
+                detour_x = 1 if px < WIDTH // 2 else -1  # Prefer the open middle of the room
+                if not can_move(state, state.player_rect, detour_x * speed, 0):
+                    detour_x = -detour_x
+                state.bot_detour = (detour_x, 0, 40)
+            else:
+                detour_y = -1 if can_move(state, state.player_rect, 0, -speed) else 1
+                state.bot_detour = (0, detour_y, 40)
+            step_x, step_y = state.bot_detour[0], state.bot_detour[1]
+
+    controls["left"] = step_x < 0
+    controls["right"] = step_x > 0
+    controls["up"] = step_y < 0
+    controls["down"] = step_y > 0
+    return controls
+
+def headless_summary(state, ticks):
+    """:return: A dictionary summarising a headless session after the given number of ticks."""
+    return {
+        "seed": state.rng.seed,
+        "ticks": ticks,
+        "game_time": state.game_time,
+        "room_id": state.room_id,
+        "game_over": state.game_over,
+        "health": state.player_stats["Health"],
+        "wildboys": len(state.equipment["Wildboys"]),
+        "rooms": [dict(room) for room in state.room_log],
+    }
+
+def run_headless(inputs=bot_controls, max_ticks=100000, dt=1 / SIM_HZ, seed=None, choose_wildboy=None, vectorized=False, record_path=None, layout_pool=None, profiler=None, events=None):
+    """
+    Runs the simulation with no window, no frame cap and no rendering.
+    :param inputs: Either a callable taking the session and the tick number and returning
+                   a controls snapshot, or an iterable of snapshots (the run stops when
+                   it runs out).
+    :param max_ticks: The maximum number of ticks to simulate.
+    :param dt: Fixed timestep in seconds.
+    :param seed: Run seed; None picks a fresh one.
+    :param choose_wildboy: Callable picking one of the offered Wildboys (or None) on
+                           level up. Defaults to taking the first offer.
+    :param vectorized: Use the NumPy enemy update path.
+    :param record_path: Optional file to save an input log of the run to.
+    :param layout_pool: Optional LayoutPool to draw rooms from.
+    :param profiler: Optional FrameProfiler; each tick is profiled as one frame.
+    :param events: Optional EventLog to record gameplay events to.
+    :return: A dictionary summarising the run.
+    """
+    if choose_wildboy is None:
+        choose_wildboy = lambda offers: offers[0] if offers else None
+    if not callable(inputs):
+        snapshots = iter(inputs)
+        inputs = lambda state, tick: next(snapshots)
+
+    state = new_game(seed, vectorized, layout_pool, events=events)
+    if record_path:
+        settings = {"vectorized": vectorized}
+        if layout_pool is not None:
+            # The replay rebuilds the same pool (see run_replay())
+            settings["layout_pool"] = {"per_tier": layout_pool.per_tier, "seed": layout_pool.seed}
+        state.recorder = InputRecorder(state.rng.seed, settings)
+    state.profiler = profiler
+    tick = 0
+    while tick < max_ticks and not state.game_over:
+        if profiler is not None:
+            profiler.begin_frame((state.wall_index, state.enemy_index))
+        try:
+            controls = inputs(state, tick)
+        except StopIteration:
+            break
+        if profiler is not None:
+            profiler.lap("input")
+        update_game(state, dt, controls)
+        if state.pending_level_up is not None:
+            resolve_level_up(state, choose_wildboy(state.pending_level_up))
+        if profiler is not None:
+            profiler.end_frame((state.wall_index, state.enemy_index))
+        tick += 1
+
+    if state.recorder is not None:
+        state.recorder.save(record_path, state_digest(state))
+        state.recorder = None
+
+    return headless_summary(state, tick)
+
+def run_headless_many(seeds, inputs=bot_controls, max_ticks=100000, dt=1 / SIM_HZ, choose_wildboy=None, vectorized=False, layout_pool=None, events=None):
+    """
+    Runs many independent headless sessions in this process, stepping them in
+    lockstep one tick at a time until each one dies or reaches max_ticks.
+    :param seeds: One run seed per session.
+    :param inputs: Callable taking a session and the tick number and returning a controls snapshot.
+    :param layout_pool: Optional LayoutPool shared by all the sessions.
+    :param events: Optional EventLog shared by all the sessions; events carry their run seed.
+    :return: One run_headless()-style summary per seed, in order.
+    """
+    if choose_wildboy is None:
+        choose_wildboy = lambda offers: offers[0] if offers else None
+
+    sessions = [new_game(seed, vectorized, layout_pool, events=events) for seed in seeds]
+    ticks = [0] * len(sessions)
+    running = list(range(len(sessions)))
+    while running:
+        still_running = []
+        for i in running:
+            state = sessions[i]
+            update_game(state, dt, inputs(state, ticks[i]))
+            if state.pending_level_up is not None:
+                resolve_level_up(state, choose_wildboy(state.pending_level_up))
+            ticks[i] += 1
+            if ticks[i] < max_ticks and not state.game_over:
+                still_running.append(i)
+        running = still_running
+
+    return [headless_summary(state, tick) for state, tick in zip(sessions, ticks)]
+
+def state_digest(state):
+    """Returns a hash of the simulation state, used to check that a replay matches."""
+    snapshot = (
+        state.room_id, state.game_time, state.game_over, tuple(state.player_rect), sorted(state.player_stats.items()),
+        [(tuple(e.rect), e.health, e.last_attack_time) for e in state.enemies],
+        [[item.name for item in items] for items in state.inventory.values()],
+        [[item.name for item in items] for items in state.equipment.values()],
+    )
+    return hashlib.sha256(repr(snapshot).encode()).hexdigest()
+
+def apply_action(state, action):
+    """Re-applies an action from an input log (see InputRecorder)."""
+    name, *args = action
+    if name == "equip":
+        equip_item(state, args[0], state.inventory[args[0]][args[1]])
+    elif name == "unequip":
+        unequip_item(state, args[0])
+    elif name == "delete":
+        delete_item(state, args[0], state.inventory[args[0]][args[1]])
+    elif name == "wildboy":
+        resolve_level_up(state, state.pending_level_up[args[0]] if args[0] >= 0 else None)
+    elif name == "reset":
+        reset_game(state, args[0])
+    else:
+        raise ValueError(f"Unknown replay action {name!r}")
+
+def run_replay(path):
+    """
+    Re-executes a recorded run tick for tick, without a window.
+    :param path: A file written by InputRecorder.save().
+    :return: A dictionary with the final state digest and whether it matches the recording.
+    """
+    log = Replay(path)
+    pool_settings = log.settings.get("layout_pool")
+    layout_pool = make_layout_pool(**pool_settings) if pool_settings else None
+    state = new_game(log.seed, log.settings.get("vectorized", False), layout_pool)
+    for tick in range(log.tick_count):
+        for action in log.actions_before(tick):
+            apply_action(state, action)
+        dt, controls = log.controls(tick)
+        update_game(state, dt, controls)
+    for action in log.actions_before(log.tick_count):
+        apply_action(state, action)
+
+    digest = state_digest(state)
+    return {
+        "ticks": log.tick_count,
+        "room_id": state.room_id,
+        "digest": digest,
+        "matches": log.digest is None or digest == log.digest,
+    }
+
+def main(seed=None, record_path=None, vectorized=False, tick_rate=SIM_HZ, fps=60, profile_path=None, event_dir=None):
+    """
+    Runs the game in a window. The simulation advances in fixed steps of
+    1 / tick_rate seconds, as many per frame as the elapsed time calls for, and
+    each frame is drawn interpolated between the last two steps.
+    :param seed: Run seed; None picks a fresh one.
+    :param record_path: Optional file to save an input log of the session to on exit.
+    :param vectorized: Use the NumPy enemy update path.
+    :param tick_rate: Simulation steps per second.
+    :param fps: Frame rate cap for rendering; 0 for uncapped.
+    :param profile_path: Optional .csv or .json file to dump the frame timings to on exit.
+    :param event_dir: Optional folder to write the gameplay event log to.
+    """
+    global WIN, full_redraw
+
+    # Pygame and the window are only set up here, so importing this module (or
+    # running it headless) never opens a display
+    pygame.init()
+    WIN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Dungeon Prototype")
+
+    events = EventLog(event_dir) if event_dir else None
+    state = new_game(seed, vectorized, prefetch_rooms=True, events=events)
+    if record_path:
+        state.recorder = InputRecorder(state.rng.seed, {"vectorized": vectorized})
+    profiler = state.profiler = FrameProfiler()  # Overlay toggled with F3
+
+    clock = pygame.time.Clock()
+    running = True
+    # What the window shows: "play", or one of the menus "inventory", "level_up"
+    # and "game_over". The game is paused in the menus, which sleep in
+    # pygame.event.wait() and only redraw after input or a state change.
+    scene = "play"
+    redraw = False  # A menu needs drawing
+    hover = None  # Level-up option under the mouse
+    sim_dt = 1 / tick_rate
+    accumulator = 0.0  # Frame time not yet simulated
+    previous = None  # Positions before the last step, for interpolation
+    dash_pressed = False  # Held until a step consumes it
+
+    while running:
+        if scene == "play":
+            frame_time = min(clock.tick(fps) / 1000.0, MAX_FRAME_TIME)
+            frame_events = pygame.event.get()
+        elif redraw:
+            frame_events = pygame.event.get()
+        else:
+            frame_events = [pygame.event.wait()] + pygame.event.get()  # Blocks until there is input
+        profiler.begin_frame((state.wall_index, state.enemy_index))  # Waiting for the frame or for input is not part of it
+        resumed = False  # A menu closed this frame
+
+        for event in frame_events:
+            if event.type == pygame.QUIT:
+                running = False
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.show_overlay = not profiler.show_overlay
+
+            if scene == "play":
+                # Open the inventory on 'F' key press
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                    scene, redraw = "inventory", True
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                    dash_pressed = True
+
+            elif scene == "inventory":
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                    scene, resumed = "play", True
+                # Handle mouse click for inventory interaction
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left click
+                    handle_inventory_click(state, *event.pos, delete_mode=pygame.key.get_pressed()[pygame.K_LSHIFT])
+                    redraw = True
+                elif event.type != pygame.MOUSEMOTION:
+                    redraw = True  # Shift highlights items for deletion; window events need a repaint
+
+            elif scene == "level_up":
+                if event.type == pygame.MOUSEMOTION:
+                    if get_level_up_layout(state).hit(event.pos) is not hover:
+                        redraw = True
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left click
+                    option = get_level_up_layout(state).hit(event.pos)
+                    if option is not None:
+                        resolve_level_up(state, option.action[1])
+                        scene, resumed = "play", True
+                else:
+                    redraw = True
 
-pygame.quit()
-sys.exit()
\ No newline at end of file
+            elif scene == "game_over":
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                    reset_game(state)
+                    scene, resumed = "play", True
+                else:
+                    redraw = True
+        profiler.lap("input")
+        if not running:
+            break
+
+        if resumed:
+            clock.tick()  # Time spent in a menu is not simulated
+            frame_time = accumulator = 0.0
+            previous = None
+            full_redraw = True
+
+        if scene != "play":
+            if redraw:
+                if scene == "inventory":
+                    draw_inventory(state, delete_mode=pygame.key.get_pressed()[pygame.K_LSHIFT])  # Check if Shift key is held
+                elif scene == "level_up":
+                    hover = get_level_up_layout(state).hit(pygame.mouse.get_pos())
+                    draw_level_up_screen(state, hover)
+                else:
+                    draw_game_over(state)
+                profiler.lap("draw")
+                pygame.display.flip()
+                profiler.lap("present")
+                redraw = False
+            profiler.end_frame((state.wall_index, state.enemy_index))
+            continue
+
+        # Run every whole step the elapsed time covers, all with this frame's input
+        accumulator += frame_time
+        controls = read_controls(dash_pressed)
+        while accumulator >= sim_dt:
+            previous = snapshot_positions(state)
+            room_id = state.room_id
+            update_game(state, sim_dt, controls)
+            accumulator -= sim_dt
+            controls["dash"] = dash_pressed = False
+            if state.room_id != room_id:
+                previous = None  # Don't interpolate across a room transition
+            if state.pending_level_up is not None:
+                scene, redraw = "level_up", True
+                break
+            if state.game_over:
+                scene, redraw = "game_over", True
+                break
+
+        updates = draw_game(state, previous, accumulator / sim_dt)
+        profiler.lap("draw")
+        pygame.display.update(updates)
+        profiler.lap("present")
+        profiler.end_frame((state.wall_index, state.enemy_index))
+
+    if state.recorder is not None:
+        state.recorder.save(record_path, state_digest(state))
+    if profile_path:
+        profiler.dump(profile_path)
+    if events is not None:
+        events.close()
+    pygame.quit()
+    sys.exit()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dungeon Delver")
+    parser.add_argument("--headless", action="store_true", help="run the simulation with the scripted bot and no window")
+    parser.add_argument("--ticks", type=int, default=100000, help="maximum ticks for a headless run")
+    parser.add_argument("--seed", type=int, default=None, help="run seed")
+    parser.add_argument("--vectorized", action="store_true", help="update enemies with the NumPy batch path")
+    parser.add_argument("--record", metavar="PATH", help="save an input log of the run for replay")
+    parser.add_argument("--replay", metavar="PATH", help="re-execute a recorded input log without a window")
+    parser.add_argument("--layout-pool", type=int, default=0, metavar="N", help="draw headless rooms from N pre-generated layouts per tier")
+    parser.add_argument("--tick-rate", type=int, default=SIM_HZ, help="simulation steps per second")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate cap of the window (0 for uncapped)")
+    parser.add_argument("--profile", metavar="PATH", help="write per-frame phase timings to a .csv or .json file on exit")
+    parser.add_argument("--events", metavar="DIR", help="write gameplay events to compressed NDJSON files in DIR")
+    args = parser.parse_args()
+
+    if args.replay:
+        start = time.perf_counter()
+        result = run_replay(args.replay)
+        elapsed = time.perf_counter() - start
+        print(result)
+        print(f"{result['ticks']} ticks replayed in {elapsed:.2f}s")
+    elif args.headless:
+        profiler = FrameProfiler() if args.profile else None
+        events = EventLog(args.events) if args.events else None
+        start = time.perf_counter()
+        result = run_headless(max_ticks=args.ticks, dt=1 / args.tick_rate, seed=args.seed, vectorized=args.vectorized, record_path=args.record,
+                              layout_pool=make_layout_pool(args.layout_pool) if args.layout_pool else None, profiler=profiler, events=events)
+        elapsed = time.perf_counter() - start
+        if profiler is not None:
+            profiler.dump(args.profile)
+        if events is not None:
+            events.close()
+        print(result)
+        print(f"{result['ticks']} ticks in {elapsed:.2f}s ({result['ticks'] / max(elapsed, 1e-9):.0f} ticks/s)")
+    else:
+        main(seed=args.seed, record_path=args.record, vectorized=args.vectorized, tick_rate=args.tick_rate, fps=args.fps, profile_path=args.profile,
+             event_dir=args.events)
@@ -0,0 +1,159 @@
+"""
+Runs many independent headless game sessions in parallel and merges their
+per-room outcomes into a single balance report.
+
+    python batch_runner.py --runs 10000 --workers 8 --out report.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+GAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dungeon Delver.py")
+
+_game = None
+_layout_pools = {}
+
+def load_game():
+    """
+    Imports the game script as a module (its file name is not importable by name).
+    Loaded once per process.
+    """
+    global _game
+    if _game is None:
+        spec = importlib.util.spec_from_file_location("dungeon_delver", GAME_PATH)
+        _game = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_game)
+    return _game
+
+
+def run_sessions(seeds, max_ticks=30000, vectorized=False, layout_pool=0, event_dir=None):
+    """
+    Plays one game with the scripted bot per seed. All of them share this process
+    and are stepped side by side (see run_headless_many()).
+    :param seeds: The run seeds.
+    :param layout_pool: Pre-generated layouts per tier, shared by every session in the
+                        process; 0 generates each room on entry.
+    :param event_dir: Optional folder for the sessions' gameplay event logs.
+    :return: The run summaries from run_headless_many(), including their per-room logs.
+    """
+    game = load_game()
+    pool = None
+    if layout_pool:
+        if layout_pool not in _layout_pools:
+            _layout_pools[layout_pool] = game.make_layout_pool(layout_pool)
+        pool = _layout_pools[layout_pool]
+    events = game.EventLog(event_dir, prefix=f"events-{seeds[0]}") if event_dir else None
+    try:
+        return game.run_headless_many(seeds, max_ticks=max_ticks, vectorized=vectorized, layout_pool=pool, events=events)
+    finally:
+        if events is not None:
+            events.close()
+
+
+def _run_job(args):
+    """Worker entry point."""
+    return run_sessions(*args)
+
+
+def _summary(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "mean": statistics.fmean(values),
+        "p50": values[len(values) // 2],
+        "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+        "max": values[-1],
+    }
+
+
+def merge_results(results):
+    """
+    Merges session summaries into one report.
+    :param results: Summaries returned by run_sessions().
+    :return: A JSON-serialisable dictionary.
+    """
+    rooms_reached = [result["room_id"] for result in results]
+    per_room = {}
+    loot_tiers = Counter()
+    for result in results:
+        for room in result["rooms"]:
+            stats = per_room.setdefault(room["room"], {"tier": room["tier"], "boss": room["boss"], "visits": 0, "cleared": 0, "damage_taken": [], "time_to_clear": []})
+            stats["visits"] += 1
+            stats["damage_taken"].append(room["damage_taken"])
+            if room["time_to_clear"] is not None:
+                stats["cleared"] += 1
+                stats["time_to_clear"].append(room["time_to_clear"])
+            loot_tiers.update(room["loot_tiers"])
+
+    return {
+        "runs": len(results),
+        "deaths": sum(result["game_over"] for result in results),
+        "timed_out": sum(not result["game_over"] for result in results),
+        "rooms_reached": _summary(rooms_reached),
+        "rooms_reached_histogram": dict(sorted(Counter(rooms_reached).items())),
+        "per_room": {
+            room: {
+                "tier": stats["tier"],
+                "boss": stats["boss"],
+                "visits": stats["visits"],
+                "clear_rate": stats["cleared"] / stats["visits"],
+                "damage_taken": _summary(stats["damage_taken"]),
+                "time_to_clear": _summary(stats["time_to_clear"]),
+            }
+            for room, stats in sorted(per_room.items())
+        },
+        "loot_tier_distribution": dict(sorted(loot_tiers.items())),
+    }
+
+
+def run_batch(runs, first_seed=0, workers=None, max_ticks=30000, vectorized=False, sessions_per_job=64, layout_pool=0, event_dir=None):
+    """
+    Fans independent sessions out over a process pool. Each job hosts a group of
+    sessions in one interpreter, so a worker pays for the game module only once.
+    :param runs: Number of sessions.
+    :param first_seed: Seeds are first_seed, first_seed + 1, ...
+    :param workers: Number of worker processes (defaults to the CPU count).
+    :param sessions_per_job: Sessions stepped together by one job.
+    :param layout_pool: Pre-generated layouts per tier in each worker (0 to disable).
+    :param event_dir: Optional folder for the gameplay event logs, one set of files per job.
+    :return: The merged report.
+    """
+    seeds = list(range(first_seed, first_seed + runs))
+    workers = workers or os.cpu_count() or 1
+    # Small enough groups that every worker gets several jobs
+    group = max(1, min(sessions_per_job, len(seeds) // (workers * 4) or 1))
+    jobs = [(seeds[i:i + group], max_ticks, vectorized, layout_pool, event_dir) for i in range(0, len(seeds), group)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [result for job in pool.map(_run_job, jobs) for result in job]
+    return merge_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many headless Dungeon Delver sessions and merge the outcomes")
+    parser.add_argument("--runs", type=int, default=1000, help="number of sessions")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first session")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--ticks", type=int, default=30000, help="maximum ticks per session")
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy enemy update path")
+    parser.add_argument("--layout-pool", type=int, default=0, metavar="N", help="draw rooms from N pre-generated layouts per tier")
+    parser.add_argument("--sessions-per-job", type=int, default=64, help="sessions hosted together by one worker job")
+    parser.add_argument("--events", metavar="DIR", help="write gameplay events to compressed NDJSON files in DIR")
+    parser.add_argument("--out", metavar="PATH", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = run_batch(args.runs, args.seed, args.workers, args.ticks, args.vectorized, args.sessions_per_job, args.layout_pool, args.events)
+    report["elapsed_seconds"] = time.perf_counter() - start
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"{args.runs} runs in {report['elapsed_seconds']:.1f}s, report written to {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
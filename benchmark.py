@@ -0,0 +1,266 @@
+"""
+Benchmarks the simulation and rendering hot paths on fixed, seeded scenarios and
+writes the results as JSON, so runs from different commits can be compared.
+
+    python benchmark.py --out before.json
+    python benchmark.py --compare before.json
+
+Every scenario sets up one room and plays it with a scripted player that circles,
+dashes and attacks without ever leaving the room. The player and the enemies
+cannot die, so the room looks the same for the whole measurement. Drawing goes
+to an off-screen surface, so no window is needed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import pygame
+
+from batch_runner import load_game
+
+IMMORTAL = 10 ** 9
+
+
+def enter_room(game, seed, room_id, vectorized=False):
+    """
+    Starts a session seeded with `seed` and moves it straight to `room_id`.
+    The player and the room's enemies are made unkillable.
+    """
+    state = game.new_game(seed, vectorized)
+    state.room_id = room_id - 1
+    game.new_room(state)
+    state.player_stats["MaxHealth"] = state.player_stats["Health"] = IMMORTAL
+    game.invalidate_stats(state)
+    set_enemies(game, state, state.enemies)
+    return state
+
+
+def set_enemies(game, state, enemies):
+    """Replaces the room's enemies (made unkillable) and rebuilds their index and store."""
+    for e in enemies:
+        e.health = e.max_health = IMMORTAL
+    state.enemies = enemies
+    state.enemy_index.clear()
+    for e in enemies:
+        state.enemy_index.insert(e, e.rect)
+    if state.use_vectorized_enemies:
+        state.enemy_store = game.EnemyStore(enemies, state.walls, seed=state.rng.ai.getrandbits(32))
+
+
+def crowd(game, state, tier, count):
+    """
+    Rolls `count` enemies of a tier for the current room. Enemies of one roll never
+    overlap, but rolls are stacked until there are enough, so a crowd can.
+    """
+    enemies = []
+    while len(enemies) < count:
+        enemies += game.roll_enemies(tier, state.walls, state.rng.spawn)
+    return enemies[:count]
+
+
+def tier_1(game, seed, vectorized=False):
+    return enter_room(game, seed, 1, vectorized)
+
+
+def tier_10_crowd(game, seed, vectorized=False):
+    state = enter_room(game, seed, 91, vectorized)
+    set_enemies(game, state, crowd(game, state, 10, 15))
+    return state
+
+
+def boss_room(game, seed, vectorized=False):
+    return enter_room(game, seed, 10, vectorized)
+
+
+def max_wildboys(game, seed, vectorized=False):
+    """Every Wildboy equipped at once, with the stats rebuilt each tick (see run_sim())."""
+    state = enter_room(game, seed, 1, vectorized)
+    state.equipment["Wildboys"] = list(game.WILDBOYS)
+    game.invalidate_stats(state)
+    return state
+
+
+def inventory_screen(game, seed, vectorized=False):
+    """Full inventory, weapon and armor equipped and every Wildboy."""
+    state = enter_room(game, seed, 91, vectorized)
+    for item_type, equipment_type in (("Weapons", "Weapon"), ("Armor", "Armor")):
+        for _ in range(3):
+            game.add_to_inventory(state, game.generate_equipment(10, equipment_type, state.rng.loot), item_type)
+        state.equipment[item_type] = [game.generate_equipment(10, equipment_type, state.rng.loot)]
+    state.equipment["Wildboys"] = list(game.WILDBOYS)
+    game.invalidate_stats(state)
+    game.invalidate_inventory_layout(state)
+    return state
+
+
+def stress(game, seed, vectorized=False):
+    state = enter_room(game, seed, 41, vectorized)
+    set_enemies(game, state, crowd(game, state, 5, 400))
+    return state
+
+
+# name -> (setup, options). Options: "vectorized" uses the NumPy enemy path,
+# "rebuild_stats" invalidates the stat cache every tick, "screen" is what gets drawn
+# and "sim" is False for screens that pause the simulation.
+SCENARIOS = {
+    "tier_1": (tier_1, {}),
+    "tier_10_crowd": (tier_10_crowd, {}),
+    "boss_room": (boss_room, {}),
+    "max_wildboys": (max_wildboys, {"rebuild_stats": True}),
+    "inventory_screen": (inventory_screen, {"screen": "inventory", "sim": False}),
+    "stress": (stress, {}),
+    "stress_vectorized": (stress, {"vectorized": True}),
+}
+
+
+def scripted_controls(game, state, tick):
+    """Circles in place (30 ticks per direction), dashes every 90 ticks and keeps attacking."""
+    controls = game.empty_controls()
+    controls[("right", "down", "left", "up")[tick // 30 % 4]] = True
+    controls["dash"] = tick % 90 == 0
+    controls["attack"] = True
+    # Aim at the first enemy, or straight up in an empty room
+    target = state.enemies[0].rect.center if state.enemies else (state.player_rect.centerx, 0)
+    controls["aim"] = target
+    return controls
+
+
+def run_sim(game, state, ticks, rebuild_stats=False):
+    """:return: Seconds spent in update_game() for the given number of ticks."""
+    dt = 1 / game.SIM_HZ
+    elapsed = 0.0
+    for tick in range(ticks):
+        controls = scripted_controls(game, state, tick)
+        if rebuild_stats:
+            game.invalidate_stats(state)
+        start = time.perf_counter()
+        game.update_game(state, dt, controls)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def run_render(game, state, frames, screen="game"):
+    """
+    Draws `frames` frames, advancing the simulation one (untimed) tick between them.
+    :return: Seconds spent drawing.
+    """
+    game.full_redraw = True
+    dt = 1 / game.SIM_HZ
+    elapsed = 0.0
+    for frame in range(frames):
+        if screen == "game":
+            game.update_game(state, dt, scripted_controls(game, state, frame))
+            start = time.perf_counter()
+            game.draw_game(state)
+        else:
+            start = time.perf_counter()
+            game.draw_inventory(state)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def run_scenario(game, name, seed, ticks, frames, repeat):
+    """
+    Times a scenario `repeat` times from a fresh setup and keeps the best run; peak
+    memory is measured in a separate traced run, since tracing slows everything down.
+    """
+    setup, options = SCENARIOS[name]
+    vectorized = options.get("vectorized", False)
+    sim = options.get("sim", True)
+    screen = options.get("screen", "game")
+
+    sim_times = []
+    render_times = []
+    for _ in range(repeat):
+        if sim:
+            sim_times.append(run_sim(game, setup(game, seed, vectorized), ticks, options.get("rebuild_stats", False)))
+        render_times.append(run_render(game, setup(game, seed, vectorized), frames, screen))
+
+    tracemalloc.start()
+    state = setup(game, seed, vectorized)
+    if sim:
+        run_sim(game, state, min(ticks, 300), options.get("rebuild_stats", False))
+    run_render(game, state, min(frames, 60), screen)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seed": seed,
+        "enemies": len(state.enemies),
+        "ticks": ticks if sim else 0,
+        "sim_ticks_per_s": ticks / min(sim_times) if sim else None,
+        "frames": frames,
+        "render_fps": frames / min(render_times),
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def git_commit():
+    """:return: The short hash of the checkout this file is in, wherever the benchmark is run from."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, seed=0, ticks=3000, frames=300, repeat=3):
+    """
+    :param names: Scenarios to run (all by default).
+    :return: A JSON-serialisable dictionary of the results per scenario.
+    """
+    game = load_game()
+    game.WIN = pygame.Surface((game.WIDTH, game.HEIGHT))  # Off-screen, see run_render()
+    results = {}
+    for name in names or SCENARIOS:
+        results[name] = run_scenario(game, name, seed, ticks, frames, repeat)
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "settings": {"seed": seed, "ticks": ticks, "frames": frames, "repeat": repeat},
+        "scenarios": results,
+    }
+
+
+def compare(report, baseline):
+    """Prints each scenario's throughput relative to a baseline report (> 1 is faster)."""
+    print(f"{'scenario':20}{'ticks/s':>12}{'fps':>12}{'peak KB':>12}")
+    for name, result in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        ratios = []
+        for key in ("sim_ticks_per_s", "render_fps", "peak_memory_kb"):
+            if result[key] and base[key]:
+                ratios.append(f"{result[key] / base[key]:11.2f}x")
+            else:
+                ratios.append(f"{'-':>12}")
+        print(f"{name:20}" + "".join(ratios))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Dungeon Delver's simulation and rendering")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="run only this scenario (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of every scenario")
+    parser.add_argument("--ticks", type=int, default=3000, help="simulation ticks timed per run")
+    parser.add_argument("--frames", type=int, default=300, help="frames drawn per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the best one counts")
+    parser.add_argument("--out", metavar="PATH", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="PATH", help="print the results relative to an earlier report")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scenario, args.seed, args.ticks, args.frames, args.repeat)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    elif not args.out:
+        print(json.dumps(report, indent=2))
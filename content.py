@@ -0,0 +1,170 @@
+"""
+Game content: equipment rolls, the Wildboy table, default player stats and the
+per-tier enemy and color tables. The balance numbers live in content.json and are
+loaded once on import into tables indexed by tier. Nothing here needs pygame or a
+display, so loot generators, balance scripts and tests can import it on its own.
+"""
+import json
+import os
+import random
+
+from entities import Equipment, Wildboy
+from wildboy_conditions import validate_wildboys
+
+CONTENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content.json")
+
+ENEMY_RANGE_KEYS = ("health", "speed", "damage", "size", "behavior", "count")
+
+
+def _pairs(values, where):
+    """Converts a list of [low, high] pairs to tuples, checking each pair."""
+    pairs = []
+    for value in values:
+        if not isinstance(value, list) or len(value) != 2 or value[0] > value[1]:
+            raise ValueError(f"{where}: expected a [low, high] range, got {value!r}")
+        pairs.append(tuple(value))
+    return pairs
+
+
+def build_tables(data):
+    """
+    Validates parsed content and builds the lookup tables from it.
+    :param data: The parsed content file.
+    :return: A dictionary of the tables, see load_content().
+    :raises ValueError: If something is missing or malformed.
+    """
+    try:
+        player = dict(data["player"])
+        room_colors = [{"bg": tuple(scheme["bg"]), "wall": tuple(scheme["wall"])} for scheme in data["room_colors"]]
+        enemy_tiers = []
+        for tier, ranges in enumerate(data["enemy_tiers"], 1):
+            enemy_tiers.append({key: _pairs([ranges[key]], f"enemy tier {tier} {key}")[0] for key in ENEMY_RANGE_KEYS})
+
+        stat_ranges = {}
+        name_parts = {}
+        for equipment_type, spec in data["equipment"].items():
+            stat_ranges[equipment_type] = {stat: _pairs(ranges, f"{equipment_type} {stat}") for stat, ranges in spec["stats"].items()}
+            name_parts[equipment_type] = (list(spec["prefixes"]), list(spec["suffixes"]))
+            if len({len(ranges) for ranges in stat_ranges[equipment_type].values()}) != 1:
+                raise ValueError(f"{equipment_type}: every stat needs a range for the same tiers")
+
+        wildboys = [Wildboy(entry["name"], dict(entry["stats"]), tuple(entry["condition"])) for entry in data["wildboys"]]
+        float_stats = set(data["float_stats"])
+    except (KeyError, TypeError) as error:
+        raise ValueError(f"Malformed content: {error!r}") from None
+    if not room_colors or not enemy_tiers:
+        raise ValueError("Content needs at least one room color scheme and one enemy tier")
+    validate_wildboys(wildboys, player)
+
+    return {
+        "player": player,
+        "room_colors": room_colors,
+        "enemy_tiers": enemy_tiers,
+        "stat_ranges": stat_ranges,
+        "name_parts": name_parts,
+        "float_stats": float_stats,
+        "wildboys": wildboys,
+    }
+
+
+def load_content(path=CONTENT_PATH):
+    """
+    Loads and validates the content tables.
+    :return: A dictionary of the tables: "player" (default stats), "room_colors" and
+             "enemy_tiers" (one entry per tier, tier 1 first), "stat_ranges",
+             "name_parts", "float_stats" and "wildboys".
+    """
+    with open(path) as f:
+        return build_tables(json.load(f))
+
+
+_tables = load_content()
+
+DEFAULT_PLAYER_STATS = _tables["player"]
+ROOM_COLORS = _tables["room_colors"]
+ENEMY_TIERS = _tables["enemy_tiers"]
+# Stat ranges per equipment type, indexed by tier (0 is the starter weapon, higher
+# tiers use the last entry). Stats in FLOAT_STATS roll a float rounded to 2
+# decimals, every other stat an int.
+STAT_RANGES = _tables["stat_ranges"]
+FLOAT_STATS = _tables["float_stats"]
+# Highest tier with its own stat ranges, per equipment type
+MAX_ITEM_TIER = {equipment_type: len(next(iter(ranges.values()))) - 1 for equipment_type, ranges in STAT_RANGES.items()}
+# Random name parts per equipment type: (prefixes, suffixes)
+NAME_PARTS = _tables["name_parts"]
+# Each Wildboy condition is (stat, op, threshold), checked against the stats from the
+# base stats and equipment (see wildboy_conditions.py); the bonus only applies while
+# it holds.
+WILDBOYS = _tables["wildboys"]
+
+
+def get_tier(room_id):
+    if room_id < 10:  # Tier 1 (Rooms 1–9)
+        return 1
+    return ((room_id - 1) // 10) + 1  # Tiers 2+ (Rooms 10–19, 20–29, etc.)
+
+def get_enemy_ranges_for_tier(tier):
+    """
+    :return: The enemy stat ranges of a tier (the last tier for anything above it),
+             as {"health", "speed", "damage", "size", "behavior", "count"} -> (low, high).
+             Shared, do not modify.
+    """
+    return ENEMY_TIERS[min(tier, len(ENEMY_TIERS)) - 1]
+
+
+def get_room_colors(tier):
+    """
+    Returns a color scheme for the room based on its tier.
+    :param tier: The current tier of the room.
+    :return: A dictionary with background and wall colors.
+    """
+    # Clamp tier to available schemes
+    return ROOM_COLORS[min(tier, len(ROOM_COLORS)) - 1]
+
+
+# Stat-based name overrides, checked in order; the first match replaces the rolled
+# prefix or suffix. The conditions also work on NumPy stat columns (see loot_batch.py).
+NAME_RULES = {
+    "Weapon": [
+        (lambda stats: stats["AttackDamage"] > 50, "prefix", "Deadly"),
+        (lambda stats: stats["AttackLength"] > stats["AttackWidth"] + 10, "prefix", "Long"),
+        (lambda stats: stats["AttackWidth"] > stats["AttackLength"] + 10, "suffix", "Cleaver"),
+    ],
+    "Armor": [
+        (lambda stats: stats["Armor"] > 15, "prefix", "Fortified"),
+        (lambda stats: stats["Health"] > 50, "prefix", "Vital"),
+        (lambda stats: abs(stats["AttackSpeed"]) < 0.5, "suffix", "Mail"),
+    ],
+}
+
+def generate_equipment(tier, equipment_type, rand=random):
+    """
+    Generate a weapon or armor based on tier.
+    :param rand: The random source to roll with, e.g. a session's rng.loot stream.
+    """
+    ranges = STAT_RANGES[equipment_type]
+
+    # Special handling for starter weapon (tier 0)
+    if tier == 0 and equipment_type == "Weapon":
+        stats = {stat: rand.randint(*stat_ranges[0]) for stat, stat_ranges in ranges.items()}
+        return Equipment("Starter Weapon", stats)
+
+    # Adjust tier for indexing (tier 1 corresponds to index 1)
+    tier_index = min(max(1, tier), MAX_ITEM_TIER[equipment_type])  # Clamp to valid range (1-10)
+
+    # Generate stats
+    stats = {stat: round(rand.uniform(*stat_ranges[tier_index]), 2) if stat in FLOAT_STATS
+             else rand.randint(*stat_ranges[tier_index])
+             for stat, stat_ranges in ranges.items()}
+
+    # Roll the name, then let the stats override a part of it
+    prefixes, suffixes = NAME_PARTS[equipment_type]
+    parts = {"prefix": rand.choice(prefixes), "suffix": rand.choice(suffixes)}
+    for condition, part, value in NAME_RULES[equipment_type]:
+        if condition(stats):
+            parts[part] = value
+            break
+
+    # Generate the name and return the result
+    name = f"{parts['prefix']} Level {tier} {parts['suffix']}"
+    return Equipment(name, stats)
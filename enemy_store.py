@@ -0,0 +1,274 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the game falls back to the per-enemy loop
+    np = None
+
+from navigation import DIRECTIONS
+
+# Flow codes -> unit directions, as an array for batched lookups
+_directions = np.array(DIRECTIONS) if np is not None else None
+# Separation tests this many times the neighbour cap of candidates per enemy at a
+# time; most enemies have found their neighbours or run out of candidates by then
+_WINDOW = 4
+
+
+class EnemyStore:
+    """
+    Structure-of-arrays copy of a room's enemies for batched updates.
+    Positions, attack timers and health live in NumPy arrays; the Enemy objects are
+    kept in the same order and updated from the arrays after each step.
+    """
+
+    def __init__(self, enemies, walls=(), seed=None):
+        """
+        :param enemies: The room's Enemy objects.
+        :param walls: The room's wall rects.
+        :param seed: Seed for the movement jitter generator.
+        """
+        if np is None:
+            raise ImportError("NumPy is required for the vectorized enemy update path")
+        self.rng = np.random.default_rng(seed)
+        self.enemies = list(enemies)
+        self.rows = {id(e): i for i, e in enumerate(self.enemies)}
+
+        self.x = np.array([e.rect.x for e in self.enemies], dtype=np.int64)
+        self.y = np.array([e.rect.y for e in self.enemies], dtype=np.int64)
+        self.w = np.array([e.rect.width for e in self.enemies], dtype=np.int64)
+        self.h = np.array([e.rect.height for e in self.enemies], dtype=np.int64)
+        self.speed = np.array([e.speed for e in self.enemies], dtype=np.float64)
+        self.behavior = np.array([e.behavior for e in self.enemies], dtype=np.float64)
+        self.health = np.array([e.health for e in self.enemies], dtype=np.float64)
+        self.attack_damage = np.array([e.weapon.attack_damage for e in self.enemies], dtype=np.float64)
+        self.attack_speed = np.array([e.weapon.attack_speed for e in self.enemies], dtype=np.float64)
+        self.attack_size = np.array([e.weapon.attack_size for e in self.enemies], dtype=np.float64)
+        self.last_attack_time = np.array([e.last_attack_time for e in self.enemies], dtype=np.float64)
+        # Fractional movement carried between ticks (not written back to the Enemy objects)
+        self.remainder_x = np.array([e.remainder_x for e in self.enemies], dtype=np.float64)
+        self.remainder_y = np.array([e.remainder_y for e in self.enemies], dtype=np.float64)
+
+        # Wall rects as columns (x, y, width, height)
+        self.walls = np.array([(w.x, w.y, w.width, w.height) for w in walls], dtype=np.int64).reshape(-1, 4)
+
+
+    def __len__(self):
+        return len(self.enemies)
+
+    def _hits_walls(self, x, y):
+        """Returns a mask of the enemies whose rect at (x, y) overlaps any wall."""
+        if not len(self.walls) or not len(x):
+            return np.zeros(len(x), dtype=bool)
+        wx, wy, ww, wh = (self.walls[:, i] for i in range(4))
+        x = x[:, None]
+        y = y[:, None]
+        hits = (x < wx + ww) & (wx < x + self.w[:, None]) & (y < wy + wh) & (wy < y + self.h[:, None])
+        return hits.any(axis=1)
+
+    def _flow_directions(self, nav, cx, cy):
+        """
+        Looks up the flow field's direction at each enemy center.
+        :return: (direction x, direction y, mask of the enemies that follow the field)
+        """
+        grid = nav.grid
+        col = (cx - grid.origin_x) // grid.cell_size
+        row = (cy - grid.origin_y) // grid.cell_size
+        inside = (col >= 0) & (col < grid.cols) & (row >= 0) & (row < grid.rows)
+        # One lookup per occupied cell; the field's search is lazy, so cells are asked one by one
+        cells, where = np.unique(np.where(inside, row * grid.cols + col, 0), return_inverse=True)
+        codes = np.array([nav.code_at(cell) for cell in cells.tolist()], dtype=np.intp)
+        code = np.where(inside, codes[where], 0)
+        directions = _directions[code]
+        return directions[:, 0], directions[:, 1], code != 0
+
+    def step(self, player_center, current_time, scale=1.0, nav=None):
+        """
+        Moves every enemy toward the player with its erratic jitter, sliding along
+        walls where the whole move is blocked, then finds the enemies that are in
+        range and off cooldown. Their attack timers are reset to current_time.
+        :param player_center: The player's (x, y) center.
+        :param current_time: The current game time.
+        :param scale: Converts the speed stat to pixels for this tick (SPEED_SCALE * dt).
+        :param nav: Optional FlowField aimed at the player; enemies whose way bends
+                    around a wall follow it instead of the straight line.
+        :return: (rows that moved, rows that attack this tick)
+        """
+        px, py = player_center
+
+        # Direction to the player, normalized
+        cx = self.x + self.w // 2
+        cy = self.y + self.h // 2
+        dir_x = (px - cx).astype(np.float64)
+        dir_y = (py - cy).astype(np.float64)
+        dist = np.hypot(dir_x, dir_y)
+        np.divide(dir_x, dist, out=dir_x, where=dist != 0)
+        np.divide(dir_y, dist, out=dir_y, where=dist != 0)
+        if nav is not None and len(self.x):
+            flow_x, flow_y, routed = self._flow_directions(nav, cx, cy)
+            dir_x = np.where(routed, flow_x, dir_x)
+            dir_y = np.where(routed, flow_y, dir_y)
+
+        # Erratic movement scaled by behavior, normalized again
+        dir_x += self.rng.uniform(-self.behavior, self.behavior)
+        dir_y += self.rng.uniform(-self.behavior, self.behavior)
+        dist = np.hypot(dir_x, dir_y)
+        np.divide(dir_x, dist, out=dir_x, where=dist != 0)
+        np.divide(dir_y, dist, out=dir_y, where=dist != 0)
+
+        moved = self._move(dir_x * self.speed * scale, dir_y * self.speed * scale)
+
+        # Attack range and cooldown checks
+        distance_to_player = np.hypot(px - (self.x + self.w // 2), py - (self.y + self.h // 2))
+        ready = current_time - self.last_attack_time >= 1 / self.attack_speed
+        attacking = (distance_to_player <= 50 * self.attack_size) & ready
+        self.last_attack_time[attacking] = current_time
+
+        return np.flatnonzero(moved), np.flatnonzero(attacking)
+
+    def _move(self, dx, dy):
+        """
+        Moves every enemy by (dx, dy) pixels, truncating like int() and carrying the
+        fraction. Where the move ends up in a wall, only its x part is kept, else
+        only its y part, else the enemy stays put.
+        :return: A mask of the enemies that moved.
+        """
+        total_x = dx + self.remainder_x
+        total_y = dy + self.remainder_y
+        step_x = np.trunc(total_x)
+        step_y = np.trunc(total_y)
+        new_x = self.x + step_x.astype(np.int64)
+        new_y = self.y + step_y.astype(np.int64)
+        blocked = self._hits_walls(new_x, new_y)
+        slide_x = blocked & (new_x != self.x) & ~self._hits_walls(new_x, self.y)
+        slide_y = blocked & ~slide_x & (new_y != self.y) & ~self._hits_walls(self.x, new_y)
+        keep_x = ~blocked | slide_x
+        keep_y = ~blocked | slide_y
+        new_x = np.where(keep_x, new_x, self.x)
+        new_y = np.where(keep_y, new_y, self.y)
+        moved = (new_x != self.x) | (new_y != self.y)
+        self.x = new_x
+        self.y = new_y
+        self.remainder_x = np.where(keep_x, total_x - step_x, 0.0)
+        self.remainder_y = np.where(keep_y, total_y - step_y, 0.0)
+        return moved
+
+    def _close_pairs(self, cx, cy, radius, limit):
+        """
+        Buckets the enemy centers into a grid with cells as large as the largest
+        enemy, counting-sort style, and lists for every enemy the first `limit`
+        enemies overlapping it. Like the scalar path, the 3x3 cells around an
+        enemy are scanned column by column and each cell in enemy order, and
+        exactly stacked enemies are skipped. Candidates are tested a few times
+        `limit` per enemy at a time, and only for enemies still short of `limit`,
+        so a pass costs about O(n * limit) however tightly the enemies are packed.
+        :return: (rows, neighbour rows), in scanning order for each row.
+        """
+        count = len(cx)
+        cell_size = max(1, int(2 * radius.max()))
+        cell_x = cx // cell_size
+        cell_y = cy // cell_size
+        cell_x -= cell_x.min()
+        cell_y -= cell_y.min()
+        stride = int(cell_y.max()) + 3  # Leaves a free row either side for the offsets
+        key = (cell_x + 1) * stride + cell_y + 1
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+
+        # The occupied cells, each a run of the sorted order
+        new_cell = np.r_[True, sorted_key[1:] != sorted_key[:-1]]
+        cell_keys = sorted_key[new_cell]
+        cell_starts = np.flatnonzero(new_cell)
+        cell_counts = np.diff(np.r_[cell_starts, count])
+        cell_of = np.empty(count, dtype=np.intp)
+        cell_of[order] = np.cumsum(new_cell) - 1
+
+        # Where each of the 9 cells around an enemy's cell starts in the sorted
+        # order, and how many enemies it holds
+        starts = np.zeros((9, len(cell_keys)), dtype=np.intp)
+        counts = np.zeros((9, len(cell_keys)), dtype=np.intp)
+        for i, (dx, dy) in enumerate((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)):
+            target = cell_keys + dx * stride + dy
+            match = np.minimum(np.searchsorted(cell_keys, target), len(cell_keys) - 1)
+            occupied = cell_keys[match] == target
+            starts[i, occupied] = cell_starts[match[occupied]]
+            counts[i, occupied] = cell_counts[match[occupied]]
+        starts = starts[:, cell_of]
+        counts = counts[:, cell_of]
+        offsets = np.cumsum(counts, axis=0) - counts
+        total = offsets[-1] + counts[-1]
+
+        window = _WINDOW * limit
+        found = np.zeros(count, dtype=np.intp)
+        position = np.zeros(count, dtype=np.intp)
+        active = np.arange(count)
+        rows = []
+        others = []
+        while len(active):
+            # The next `window` candidates of every enemy still looking, enemy by
+            # enemy, then cell by cell
+            around_offsets = offsets[:, active]
+            around_counts = counts[:, active]
+            low = np.clip(position[active] - around_offsets, 0, around_counts)
+            take = np.clip(position[active] + window - around_offsets, 0, around_counts) - low
+            take = take.T.ravel()
+            first = np.repeat(np.cumsum(take) - take, take)
+            candidates = np.repeat((starts[:, active] + low).T.ravel(), take) + np.arange(len(first)) - first
+            row = np.repeat(active, take.reshape(-1, 9).sum(axis=1))
+            other = order[candidates]
+            dx = cx[row] - cx[other]
+            dy = cy[row] - cy[other]
+            dist_sq = dx * dx + dy * dy
+            reach = radius[row] + radius[other]
+            close = (dist_sq > 0) & (dist_sq < reach * reach)
+            row, other = row[close], other[close]
+            # Keep a row's overlaps in order until it has `limit` of them
+            first = np.flatnonzero(np.r_[True, row[1:] != row[:-1]]) if len(row) else np.empty(0, dtype=np.intp)
+            rank = np.arange(len(row)) - np.repeat(first, np.diff(np.r_[first, len(row)]))
+            keep = found[row] + rank < limit
+            rows.append(row[keep])
+            others.append(other[keep])
+            found += np.bincount(row[keep], minlength=count)
+            position[active] += window
+            active = active[(found[active] < limit) & (position[active] < total[active])]
+        return np.concatenate(rows), np.concatenate(others)
+
+    def separate(self, fraction, max_neighbours):
+        """
+        Pushes overlapping enemies apart, each taking half of the overlap times
+        fraction from at most max_neighbours of the enemies around it, the same
+        ones the scalar path picks. Enemies are treated as circles of half their
+        size; pairs come from a grid rebuilt from the current positions, so a call
+        costs about O(n * max_neighbours) rather than O(n^2).
+        :return: The rows that moved.
+        """
+        if len(self.x) < 2:
+            return np.empty(0, dtype=np.intp)
+        cx = self.x + self.w // 2
+        cy = self.y + self.h // 2
+        radius = np.maximum(self.w, self.h) / 2
+        row, other = self._close_pairs(cx, cy, radius, max_neighbours)
+        dx = (cx[row] - cx[other]).astype(np.float64)
+        dy = (cy[row] - cy[other]).astype(np.float64)
+        dist = np.sqrt(dx * dx + dy * dy)
+        push = (radius[row] + radius[other] - dist) / 2 / dist
+        push_x = np.bincount(row, weights=dx * push, minlength=len(self.x)) * fraction
+        push_y = np.bincount(row, weights=dy * push, minlength=len(self.x)) * fraction
+        return np.flatnonzero(self._move(push_x, push_y))
+
+    def hit(self, enemy, amount):
+        """Applies player damage to an enemy's row."""
+        self.health[self.rows[id(enemy)]] -= amount
+
+    def remove_dead(self):
+        """
+        Drops every enemy whose health has run out.
+        :return: The removed Enemy objects.
+        """
+        alive = self.health > 0
+        if alive.all():
+            return []
+        dead = [self.enemies[i] for i in np.flatnonzero(~alive)]
+        self.enemies = [self.enemies[i] for i in np.flatnonzero(alive)]
+        self.rows = {id(e): i for i, e in enumerate(self.enemies)}
+        for name in ("x", "y", "w", "h", "speed", "behavior", "health", "attack_damage",
+                     "attack_speed", "attack_size", "last_attack_time", "remainder_x", "remainder_y"):
+            setattr(self, name, getattr(self, name)[alive])
+        return dead
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+
+# Entities are slotted dataclasses: fixed fields, no per-instance __dict__, and
+# attribute access instead of string-keyed dict lookups in the hot loops.
+# eq=False keeps identity semantics (and hashing), which is what the inventory
+# lists and the spatial index expect.
+
+
+@dataclass(slots=True, eq=False)
+class EnemyWeapon:
+    attack_damage: int
+    attack_speed: float  # Attacks per second
+    attack_size: float   # Scales both the attack range and the sword hitbox
+
+
+@dataclass(slots=True, eq=False)
+class Enemy:
+    rect: object  # pygame.Rect
+    health: float
+    max_health: float
+    speed: float
+    damage: int       # Contact damage
+    behavior: float   # How erratically the enemy moves
+    weapon: EnemyWeapon
+    last_attack_time: float  # Game time of the last sword attack
+    attack_ready: bool = True  # Cooldown over; set again by a timer after each attack
+    sword_rect: object = None  # Hitbox of the swing being drawn; a timer clears it
+    remainder_x: float = 0.0  # Fractional movement carried between ticks
+    remainder_y: float = 0.0
+
+
+@dataclass(slots=True, eq=False)
+class Equipment:
+    name: str
+    stats: dict  # Stat name -> bonus, e.g. {"AttackDamage": 12}
+
+
+@dataclass(slots=True, eq=False)
+class Wildboy:
+    name: str
+    stats: dict
+    condition: tuple  # (stat, op, threshold), see wildboy_conditions.py
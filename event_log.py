@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class EventLog:
+    """
+    Structured gameplay events (damage, kills, loot, equips, room transitions, ...)
+    written to gzip-compressed newline-delimited JSON files.
+
+    emit() only appends to a bounded ring buffer, so the game thread never waits
+    on encoding or disk I/O. A background thread drains the buffer every
+    flush_interval seconds and writes the events. When the writer falls behind
+    and the buffer is full, the oldest events are dropped and counted.
+    """
+
+    def __init__(self, directory, prefix="events", capacity=65536, flush_interval=0.5, events_per_file=1_000_000):
+        """
+        :param directory: Folder the files go to; created if missing.
+        :param prefix: File names are <prefix>-<start time>-<index>.ndjson.gz.
+        :param capacity: Events the ring buffer holds before dropping the oldest.
+        :param flush_interval: Seconds between writer passes.
+        :param events_per_file: Events written to a file before starting the next one.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.events_per_file = events_per_file
+        self.flush_interval = flush_interval
+        self.buffer = deque(maxlen=capacity)
+        self.dropped = 0  # Events lost to a full buffer
+        self.written = 0
+        self.paths = []  # Files written so far
+
+        self._file = None
+        self._file_events = 0
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._writer.start()
+
+    def emit(self, kind, fields):
+        """
+        Queues an event. Called from the game thread; never blocks.
+        :param kind: Event type, e.g. "kill".
+        :param fields: A JSON-serialisable dictionary, owned by the log from now on.
+        """
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        fields["event"] = kind
+        self.buffer.append(fields)
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+        if self._file is not None:
+            self._file.close()
+
+    def _drain(self):
+        """Writes everything currently in the buffer (writer thread only)."""
+        lines = []
+        buffer = self.buffer
+        while buffer:
+            lines.append(json.dumps(buffer.popleft(), separators=(",", ":")))
+        while lines:
+            if self._file is None or self._file_events >= self.events_per_file:
+                self._open_next()
+            chunk = lines[:self.events_per_file - self._file_events]
+            del lines[:len(chunk)]
+            self._file.write("\n".join(chunk) + "\n")
+            self._file_events += len(chunk)
+            self.written += len(chunk)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.paths):04d}.ndjson.gz")
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file_events = 0
+        self.paths.append(path)
+
+    def close(self):
+        """Writes the remaining events and closes the current file."""
+        if not self._closed.is_set():
+            self._closed.set()
+            self._writer.join()
+
+
+def read_events(paths):
+    """Yields the events stored in the given .ndjson.gz files, in order."""
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
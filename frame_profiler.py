@@ -0,0 +1,148 @@
+import csv
+import json
+import time
+from collections import deque
+
+from text_cache import text_cache
+
+COLOR_OVERLAY_BG = (0, 0, 0)
+COLOR_OVERLAY_TEXT = (200, 255, 200)
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class FrameProfiler:
+    """
+    Times the phases of each frame and counts the work done in it.
+
+    A frame is opened with begin_frame(); every lap(phase) then charges the time
+    since the previous lap to that phase, so the phases of a frame add up to its
+    total. Counters (stat recomputations, collision tests, ...) are added with
+    count(). The last `window` frames feed the rolling percentiles of the overlay;
+    up to `history` frames are kept for the dump written at exit.
+    """
+
+    def __init__(self, window=300, history=36000, refresh=30):
+        """
+        :param window: Frames the rolling percentiles cover.
+        :param history: Frames kept for dump(); the oldest are dropped first.
+        :param refresh: Frames between recomputing the percentiles shown by the overlay.
+        """
+        self.window = deque(maxlen=window)
+        self.history = deque(maxlen=history)
+        self.refresh = refresh
+        self.columns = []  # Phase and counter names in first-seen order, for the dump
+        self.frame_count = 0
+        self.frame = None  # The open frame: {name: milliseconds or count}
+        self.frame_start = 0.0
+        self.last_lap = 0.0
+        self.spatial_start = []  # (index, queries, rect tests) at the frame start
+        self.overlay_summary = {}
+        self.show_overlay = False
+
+    def begin_frame(self, indexes=()):
+        """
+        :param indexes: The session's SpatialHash indexes. They count their own
+                        collision tests, read as deltas at end_frame().
+        """
+        self.frame = {}
+        self.frame_start = self.last_lap = time.perf_counter()
+        self.spatial_start = [(index, index.queries, index.rect_tests) for index in indexes]
+
+    def lap(self, phase):
+        """Charges the time since the last lap (or the frame start) to a phase."""
+        if self.frame is None:
+            return
+        now = time.perf_counter()
+        self.frame[phase] = self.frame.get(phase, 0.0) + (now - self.last_lap) * 1000.0
+        self.last_lap = now
+
+    def count(self, counter, n=1):
+        if self.frame is not None:
+            self.frame[counter] = self.frame.get(counter, 0) + n
+
+    def end_frame(self, indexes=()):
+        """
+        Closes the open frame and adds it to the rolling window and the history.
+        :param indexes: The session's SpatialHash indexes now; indexes that replaced
+                        the ones passed to begin_frame() (a new room) count in full.
+        """
+        if self.frame is None:
+            return
+        frame = self.frame
+        frame["frame_ms"] = (time.perf_counter() - self.frame_start) * 1000.0
+        queries = tests = 0
+        for index in indexes:
+            start_queries = start_tests = 0
+            for start_index, index_queries, index_tests in self.spatial_start:
+                if start_index is index:
+                    start_queries, start_tests = index_queries, index_tests
+            queries += index.queries - start_queries
+            tests += index.rect_tests - start_tests
+        self.spatial_start = []
+        frame["collision_queries"] = queries
+        frame["collision_tests"] = tests
+        for name in frame:
+            if name not in self.columns:
+                self.columns.append(name)
+        self.window.append(frame)
+        self.history.append(frame)
+        self.frame = None
+        self.frame_count += 1
+        if self.frame_count % self.refresh == 1:
+            self.overlay_summary = self.summary(self.window)
+
+    def summary(self, frames=None):
+        """
+        :param frames: The frames to summarise; the whole history by default.
+        :return: {name: {"mean", "p50", "p95", "p99", "max"}} for every phase and counter.
+        """
+        frames = self.history if frames is None else frames
+        result = {}
+        for name in self.columns:
+            # Frames that never reached a phase or counter count as 0 for it
+            values = sorted(frame.get(name, 0) for frame in frames)
+            if not values:
+                continue
+            result[name] = {
+                "mean": sum(values) / len(values),
+                "p50": _percentile(values, 0.5),
+                "p95": _percentile(values, 0.95),
+                "p99": _percentile(values, 0.99),
+                "max": values[-1],
+            }
+        return result
+
+    def draw_overlay(self, surface, font, x, y):
+        """
+        Draws the rolling p50 / p95 / p99 of every phase and counter.
+        :return: The rects drawn, for the dirty-rect update.
+        """
+        lines = [f"{'':18}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for name, stats in self.overlay_summary.items():
+            lines.append(f"{name:18}{stats['p50']:8.2f}{stats['p95']:8.2f}{stats['p99']:8.2f}")
+        surfaces = [text_cache.render(font, line, COLOR_OVERLAY_TEXT) for line in lines]
+        line_height = font.get_linesize()
+        background = (x, y, max(s.get_width() for s in surfaces) + 8, line_height * len(surfaces) + 8)
+        rect = surface.fill(COLOR_OVERLAY_BG, background)
+        for i, text in enumerate(surfaces):
+            surface.blit(text, (x + 4, y + 4 + i * line_height))
+        return [rect]
+
+    def dump(self, path):
+        """
+        Writes the recorded frames. A .csv path gets one row per frame; any other
+        path gets JSON with the summary followed by the frames.
+        """
+        frames = list(self.history)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=self.columns, restval=0)
+                writer.writeheader()
+                writer.writerows(frames)
+        else:
+            with open(path, "w") as f:
+                json.dump({"frames": len(frames), "summary": self.summary(), "frame_data": frames}, f)
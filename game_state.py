@@ -0,0 +1,115 @@
+import pygame
+
+from random_streams import RandomStreams
+from scheduler import Scheduler
+from spatial_hash import SpatialHash
+
+
+class GameState:
+    """
+    Everything one game session mutates: the player, the current room, timers,
+    its random streams and its optional input recorder. The game functions take
+    the session they act on as their first argument, so one process can host any
+    number of independent sessions side by side.
+    """
+
+    def __init__(self, seed=None, vectorized=False):
+        """
+        :param seed: Run seed for the random streams; None picks a fresh one.
+        :param vectorized: Update enemies with the NumPy batch path (see enemy_store.py).
+        """
+        # Seeded random streams for layout, spawns, loot, Wildboy offers and enemy AI.
+        # Reseeded by reset_game(); together with game_time this makes a run reproducible.
+        self.rng = RandomStreams(seed)
+        self.recorder = None  # Optional InputRecorder capturing this run for replay
+        self.profiler = None  # Optional FrameProfiler timing the phases of update_game()
+        self.events = None  # Optional EventLog of gameplay events (see log_event())
+        self.use_vectorized_enemies = vectorized
+
+        # Player
+        self.player_stats = {}
+        self.inventory = {"Weapons": [], "Armor": []}
+        self.equipment = {"Weapons": [], "Armor": [], "Wildboys": []}
+        self.player_rect = None  # Placed by reset_game()
+        self.player_subpixel = [0.0, 0.0]  # Fractional x, y movement carried between ticks
+
+        # Cached aggregate of base stats and equipment, the compiled conditions of the
+        # equipped Wildboys, and the final stats with the active Wildboys added
+        # (see calculate_final_stats())
+        self.gear_stats = None
+        self.wildboy_conditions = None
+        self.active_wildboys = ()
+        self.final_stats_cache = None
+        self.stats_dirty = True
+
+        # Simulation clock in seconds, advanced by update_game(). All cooldowns use it
+        # instead of wall-clock time so the game can be stepped faster than real time.
+        self.game_time = 0.0
+        # Timers on the simulation clock. Cooldowns and timed windows clear one of the
+        # flags below when they start and schedule a timer that sets it back.
+        self.timers = Scheduler()
+
+        # Dash
+        self.dashing = False
+        self.dash_ready = True  # Dash cooldown over
+        self.invulnerable = False  # Start of a dash, see dash_invuln_duration
+        self.invulnerability_timer = None
+        self.dash_direction = pygame.math.Vector2(0, 0)  # Direction vector for the dash
+        self.dash_distance_remaining = 0
+
+        # Attacks and damage
+        self.attack_ready = True  # Sword attack cooldown over
+        self.sword_hitbox = None  # Will store the sword rect when attacking
+        self.contact_damage_ready = True  # Enemies touching the player can hurt it again
+
+        # Current room
+        self.room_id = 0
+        self.walls = []
+        self.enemies = []
+        self.color_bg = (30, 30, 30)
+        self.color_wall = (100, 100, 100)
+
+        # Broadphase indexes, rebuilt in new_room(). Walls are static for the room,
+        # enemies are re-bucketed as they move.
+        self.wall_index = SpatialHash()
+        self.enemy_index = SpatialHash()
+        self.enemy_store = None  # EnemyStore of the room when use_vectorized_enemies is set
+        self.nav = None  # FlowField toward the player, rebuilt in new_room()
+        self.layout_pool = None  # Optional LayoutPool the rooms are drawn from, may be shared
+        self.prefetch_rooms = False  # Generate the next room in the background (see new_room())
+        self.next_room = None  # Future of the pre-generated next room
+
+        # Chest
+        self.chest_rect = None
+        self.chest_spawned = False
+        self.chest_opened = False
+        self.chest_item = None  # Tracks the item currently in the chest
+        self.chest_interacted = False  # Tracks if the chest interaction key has already been handled
+
+        # Health fountain
+        self.health_fountain_rect = None
+        self.fountain_spawned = False
+        self.fountain_used = False
+        self.fountain_should_spawn = False  # Tracks if the fountain should spawn in the next room
+
+        # Level gate
+        self.levelgate_rect = None
+        self.levelgate_spawned = False
+        self.levelgate_used = False
+        self.levelgate_should_spawn = False
+        self.pending_level_up = None  # Wildboys on offer after touching the level gate
+
+        self.game_over = False
+
+        # Per-room outcomes of the current run, for headless and batch analysis
+        self.room_log = []
+
+        # Cached floor and walls of the current room, baked on the next draw
+        self.room_background = None
+        # Laid-out menu screens (see ui.py), rebuilt after the inventory, the
+        # equipment or the level-up offer changes
+        self.inventory_layout = None
+        self.level_up_layout = None
+
+        # Detour the scripted bot follows after getting blocked: (step x, step y, ticks left)
+        self.bot_detour = None
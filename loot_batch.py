@@ -0,0 +1,102 @@
+"""
+Bulk loot generation for economy analysis: N items of one tier and type per call,
+sampled column by column with NumPy from the same tables as generate_equipment().
+
+    batch = generate_equipment_batch(5, "Weapon", 1_000_000, seed=0)
+    batch.stats["AttackDamage"].mean()
+    batch.to_equipment()[:10]
+"""
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; generate_equipment() covers single items
+    np = None
+
+from content import FLOAT_STATS, MAX_ITEM_TIER, NAME_PARTS, NAME_RULES, STAT_RANGES
+from entities import Equipment
+
+# equipment type -> (stat names, low and high bound arrays of shape (stats, tiers)),
+# built from STAT_RANGES on first use
+_range_tables = {}
+
+def _range_table(equipment_type):
+    table = _range_tables.get(equipment_type)
+    if table is None:
+        ranges = STAT_RANGES[equipment_type]
+        bounds = np.array(list(ranges.values()), dtype=float)  # (stats, tiers, 2)
+        table = _range_tables[equipment_type] = (list(ranges), bounds[:, :, 0], bounds[:, :, 1])
+    return table
+
+
+class LootBatch:
+    """
+    Columnar batch of equipment of one tier and type.
+    stats maps each stat name to an array with one value per item; prefix and
+    suffix are indices into NAME_PARTS[equipment_type].
+    """
+
+    def __init__(self, tier, equipment_type, stats, prefix, suffix, starter=False):
+        self.tier = tier
+        self.equipment_type = equipment_type
+        self.stats = stats
+        self.prefix = prefix
+        self.suffix = suffix
+        self.starter = starter  # Tier 0 weapons are all named "Starter Weapon"
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def names(self):
+        """:return: The item names, as generate_equipment() would build them."""
+        if self.starter:
+            return ["Starter Weapon"] * len(self)
+        prefixes, suffixes = NAME_PARTS[self.equipment_type]
+        middle = f" Level {self.tier} "
+        return [prefixes[p] + middle + suffixes[s] for p, s in zip(self.prefix.tolist(), self.suffix.tolist())]
+
+    def to_equipment(self):
+        """:return: A list of Equipment, the form the inventory and chests use."""
+        columns = {stat: values.tolist() for stat, values in self.stats.items()}
+        return [Equipment(name, {stat: values[i] for stat, values in columns.items()})
+                for i, name in enumerate(self.names())]
+
+
+def generate_equipment_batch(tier, equipment_type, n, seed=None):
+    """
+    Rolls n items of one tier and type. Stats follow the same ranges as
+    generate_equipment(), but come from a NumPy generator, so the items are not
+    the ones a session's loot stream would roll.
+    :param seed: Seed for the NumPy generator; None picks a fresh one.
+    :return: A LootBatch.
+    """
+    if np is None:
+        raise RuntimeError("generate_equipment_batch requires NumPy")
+    rng = np.random.default_rng(seed)
+    names, lows, highs = _range_table(equipment_type)
+
+    # Tier 0 weapons are starter weapons; everything else is clamped to the item tiers
+    starter = tier == 0 and equipment_type == "Weapon"
+    tier_index = 0 if starter else min(max(1, tier), MAX_ITEM_TIER[equipment_type])
+
+    stats = {}
+    for i, stat in enumerate(names):
+        low, high = lows[i, tier_index], highs[i, tier_index]
+        if stat in FLOAT_STATS:
+            stats[stat] = np.round(rng.uniform(low, high, n), 2)
+        else:
+            stats[stat] = rng.integers(int(low), int(high) + 1, n)
+    if starter:
+        return LootBatch(tier, equipment_type, stats, np.zeros(n, dtype=np.intp), np.zeros(n, dtype=np.intp), starter=True)
+
+    # Roll the name parts, then apply the first matching override per item
+    prefixes, suffixes = NAME_PARTS[equipment_type]
+    parts = {
+        "prefix": rng.integers(0, len(prefixes), n),
+        "suffix": rng.integers(0, len(suffixes), n),
+    }
+    unmatched = np.ones(n, dtype=bool)
+    for condition, part, value in NAME_RULES[equipment_type]:
+        match = unmatched & condition(stats)
+        options = prefixes if part == "prefix" else suffixes
+        parts[part][match] = options.index(value)
+        unmatched &= ~match
+    return LootBatch(tier, equipment_type, stats, parts["prefix"], parts["suffix"])
@@ -0,0 +1,266 @@
+import heapq
+import threading
+from collections import OrderedDict
+
+import pygame
+
+# Neighbour offsets (column, row); diagonals come last so straight moves win ties
+_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+_DIAGONAL = 0.7071067811865476
+# Unit direction of each flow code; code 0 means no direction
+DIRECTIONS = ((0.0, 0.0),) + tuple((-dc * (_DIAGONAL if dc and dr else 1.0), -dr * (_DIAGONAL if dc and dr else 1.0))
+                                   for dc, dr in _STEPS)
+# Integer step costs (a cell length is 10) and the extra cost of entering a cell
+# within the clearance of a wall
+STRAIGHT_COST = 10
+DIAGONAL_COST = 14
+CLEARANCE_COST = 20
+_UNREACHED = 1 << 62
+
+# Neighbour patterns are interned, so cells with the same surroundings share one tuple
+_patterns = {}
+
+
+class NavGrid:
+    """
+    The walls of a room rasterized into a grid of cells. Cells a wall overlaps are
+    never entered, and cells within `clearance` pixels of a wall cost extra, so
+    routes keep away from walls where they can.
+
+    A grid only depends on the walls, so one grid serves every visit to a room
+    layout (see nav_grid()). The neighbours of a cell are worked out the first time
+    a search expands it and kept; cells with no wall or clearance around them all
+    share one pattern.
+    """
+
+    def __init__(self, bounds, walls, cell_size=20, clearance=0):
+        """
+        :param bounds: Rect of the area the grid covers.
+        :param walls: The room's wall rects.
+        :param cell_size: Cell edge in pixels.
+        :param clearance: Pixels kept free around the walls, e.g. half the largest
+                          enemy, so routes leave room for the enemies following them.
+        """
+        self.origin_x, self.origin_y = bounds.x, bounds.y
+        self.cell_size = cell_size
+        self.cols = -(-bounds.width // cell_size)
+        self.rows = -(-bounds.height // cell_size)
+
+        # 0 open, 1 within the clearance of a wall, 2 wall
+        self.blocked = bytearray(self.cols * self.rows)
+        for margin, value in ((clearance, 1), (0, 2)):
+            for wall in walls:
+                self._fill(pygame.Rect(wall).inflate(2 * margin, 2 * margin), value)
+
+        # Per cell (cell offset, flow code, cost) of its non-wall neighbours, the
+        # code's direction pointing from the neighbour back to the cell: the way the
+        # neighbour steers when a search reaches it from here. None until needed.
+        self.links = [None] * len(self.blocked)
+        self.open_pattern = tuple((dr * self.cols + dc, code, DIAGONAL_COST if dc and dr else STRAIGHT_COST)
+                                  for code, (dc, dr) in enumerate(_STEPS, 1))
+
+        # Unobstructed (octile) cost between two cells, by column and row distance
+        self.octile = [[STRAIGHT_COST * max(dc, dr) + (DIAGONAL_COST - STRAIGHT_COST) * min(dc, dr)
+                        for dr in range(self.rows)] for dc in range(self.cols)]
+
+    def _fill(self, rect, value):
+        """Marks the cells a rect overlaps with value, never lowering a mark."""
+        left = max(0, (rect.left - self.origin_x) // self.cell_size)
+        right = min(self.cols - 1, (rect.right - 1 - self.origin_x) // self.cell_size)
+        top = max(0, (rect.top - self.origin_y) // self.cell_size)
+        bottom = min(self.rows - 1, (rect.bottom - 1 - self.origin_y) // self.cell_size)
+        for row in range(top, bottom + 1):
+            for cell in range(row * self.cols + left, row * self.cols + right + 1):
+                if self.blocked[cell] < value:
+                    self.blocked[cell] = value
+
+    def cell_at(self, x, y):
+        """:return: The index of the cell containing the point, or None outside the grid."""
+        col = (x - self.origin_x) // self.cell_size
+        row = (y - self.origin_y) // self.cell_size
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return None
+
+    def link(self, cell):
+        """Works out and keeps the neighbour pattern of a cell (see links)."""
+        cols, rows, blocked = self.cols, self.rows, self.blocked
+        row, col = divmod(cell, cols)
+        if 0 < col < cols - 1 and 0 < row < rows - 1 and not any(blocked[cell + offset] for offset, _, _ in self.open_pattern):
+            pattern = self.open_pattern
+        else:
+            cells = []
+            for code, (dc, dr) in enumerate(_STEPS, 1):
+                c, r = col + dc, row + dr
+                if not (0 <= c < cols and 0 <= r < rows) or blocked[r * cols + c] == 2:
+                    continue
+                # Diagonals must not cut a wall corner
+                if dc and dr and (blocked[row * cols + c] == 2 or blocked[r * cols + col] == 2):
+                    continue
+                cost = DIAGONAL_COST if dc and dr else STRAIGHT_COST
+                if blocked[r * cols + c]:
+                    cost += CLEARANCE_COST
+                cells.append((dr * cols + dc, code, cost))
+            pattern = tuple(cells)
+            pattern = _patterns.setdefault(pattern, pattern)
+        self.links[cell] = pattern
+        return pattern
+
+    def straight(self, start, end):
+        """
+        :return: True if the grid line from start to end only enters open cells and
+                 cuts no wall corner, i.e. going straight costs the octile distance.
+        """
+        cols, blocked = self.cols, self.blocked
+        start_row, start_col = divmod(start, cols)
+        end_row, end_col = divmod(end, cols)
+        dc, dr = end_col - start_col, end_row - start_row
+        steps = max(abs(dc), abs(dr))
+        col, row = start_col, start_row
+        for i in range(1, steps + 1):
+            # One step along the longer axis, at most one along the other
+            next_col = start_col + (2 * i * dc + steps) // (2 * steps)
+            next_row = start_row + (2 * i * dr + steps) // (2 * steps)
+            if blocked[next_row * cols + next_col]:
+                return False
+            if next_col != col and next_row != row and (blocked[row * cols + next_col] == 2 or blocked[next_row * cols + col] == 2):
+                return False
+            col, row = next_col, next_row
+        return True
+
+
+# Grids of recently built room layouts, shared by every session (see nav_grid())
+_grids = OrderedDict()
+_grids_lock = threading.Lock()  # Rooms are also built on the room generator thread
+MAX_CACHED_GRIDS = 64
+
+
+def nav_grid(bounds, walls, cell_size=20, clearance=0):
+    """
+    Returns the NavGrid of a room layout, building it only if the same walls were
+    not rasterized recently, e.g. a layout pool handing out a layout again.
+    """
+    key = (tuple(bounds), tuple(tuple(wall) for wall in walls), cell_size, clearance)
+    with _grids_lock:
+        grid = _grids.get(key)
+        if grid is not None:
+            _grids.move_to_end(key)
+            return grid
+    grid = NavGrid(bounds, walls, cell_size, clearance)
+    with _grids_lock:
+        grid = _grids.setdefault(key, grid)
+        if len(_grids) > MAX_CACHED_GRIDS:
+            _grids.popitem(last=False)  # Drop the least recently used
+    return grid
+
+
+class FlowField:
+    """
+    Shared flow field toward one target over a room's NavGrid.
+
+    Following the field's directions leads around the walls to the target, so
+    steering an enemy is one lookup, whatever the number of enemies. A cell gets a
+    direction only where its route has to bend around something; where the straight
+    line is as short as the route it gets none.
+
+    The directions come from one shortest-path search out from the target's cell.
+    The search is lazy: a cell with a clear straight line to the target needs none,
+    and otherwise it only runs until the cells actually asked about are settled,
+    which with enemies chasing the player is usually a fraction of the room. It
+    picks up where it stopped when another cell is asked about. Searches for the
+    last few target cells are kept, so a player going back and forth between cells
+    does not start them over.
+    """
+
+    def __init__(self, grid, cached_targets=8):
+        """
+        :param grid: The room's NavGrid.
+        :param cached_targets: Searches kept for target cells the target has left.
+        """
+        self.grid = grid
+        self.cached_targets = cached_targets
+        self.searches = OrderedDict()  # target cell -> (cost, flow, settled, heap, straight)
+        self.target_cell = None
+        # Per cell flow code (see DIRECTIONS) toward the target, final once the cell
+        # is settled; 0 where the straight line is as short as the route, where
+        # there is no route, in walls and at the target
+        count = len(grid.blocked)
+        self.flow = bytearray(count)
+        self.settled = bytearray(count)
+        self.cost = None
+        self.heap = []
+        self.straight = {}  # cell -> whether its straight line to the target is clear
+
+    def set_target(self, x, y):
+        """Points the field at (x, y); only does anything if its cell changed."""
+        cell = self.grid.cell_at(x, y)
+        if cell is None or cell == self.target_cell:
+            return
+        self.target_cell = cell
+        search = self.searches.pop(cell, None)
+        if search is None:
+            count = len(self.grid.blocked)
+            cost = [_UNREACHED] * count
+            cost[cell] = 0
+            search = (cost, bytearray(count), bytearray(count), [(0, cell)], {})
+        self.searches[cell] = search
+        if len(self.searches) > self.cached_targets + 1:
+            self.searches.popitem(last=False)  # Drop the least recently left
+        self.cost, self.flow, self.settled, self.heap, self.straight = search
+
+    def settle(self, cell):
+        """Continues the search until the cell's flow code is final."""
+        settled = self.settled
+        if settled[cell] or self.grid.blocked[cell] == 2:
+            return  # Walls are never reached, their code stays 0
+        grid = self.grid
+        links, link = grid.links, grid.link
+        cols, octile = grid.cols, grid.octile
+        target_row, target_col = divmod(self.target_cell, cols)
+        cost, flow, heap = self.cost, self.flow, self.heap
+        heappush, heappop = heapq.heappush, heapq.heappop
+        while heap and not settled[cell]:
+            current_cost, current = heappop(heap)
+            if settled[current]:
+                continue  # Stale entry, the cell was reached more cheaply since
+            settled[current] = 1
+            if flow[current]:
+                # The straight line is as short as the route, head straight for the target
+                row, col = divmod(current, cols)
+                if current_cost <= octile[abs(col - target_col)][abs(row - target_row)]:
+                    flow[current] = 0
+            pattern = links[current]
+            if pattern is None:
+                pattern = link(current)
+            for offset, code, step in pattern:
+                nxt = current + offset
+                nxt_cost = current_cost + step
+                if nxt_cost < cost[nxt]:
+                    cost[nxt] = nxt_cost
+                    flow[nxt] = code
+                    heappush(heap, (nxt_cost, nxt))
+
+    def code_at(self, cell):
+        """:return: The flow code of a cell (see DIRECTIONS); 0 without a target."""
+        if self.target_cell is None:
+            return 0
+        if not self.settled[cell]:
+            straight = self.straight.get(cell)
+            if straight is None:
+                straight = self.straight[cell] = self.grid.straight(self.target_cell, cell)
+            if straight:
+                return 0  # Its route costs the straight-line distance, no search needed
+            self.settle(cell)
+        return self.flow[cell]
+
+    def direction_at(self, x, y):
+        """
+        :return: The (x, y) unit direction toward the target from a point, or None
+                 where the field has no direction: the straight line is fine there,
+                 or it is the target cell, a wall, unreachable or outside the grid.
+        """
+        cell = self.grid.cell_at(x, y)
+        if cell is None:
+            return None
+        code = self.code_at(cell)
+        return DIRECTIONS[code] if code else None
@@ -0,0 +1,27 @@
+import random
+
+# One independent stream per subsystem, so e.g. an extra loot roll never shifts
+# the next room's layout or enemy spawns.
+SUBSYSTEMS = ("layout", "spawn", "loot", "wildboys", "ai")
+
+
+class RandomStreams:
+    """
+    Seeded random.Random streams for each game subsystem, all derived from a
+    single run seed.
+    """
+
+    def __init__(self, seed=None):
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """
+        Restarts every stream from a run seed.
+        :param seed: An int; None picks a fresh random seed.
+        """
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        for name in SUBSYSTEMS:
+            # String seeds are hashed with SHA-512, so they are stable across processes
+            setattr(self, name, random.Random(f"{seed}:{name}"))
@@ -0,0 +1,105 @@
+import json
+import struct
+import zlib
+
+# Controls snapshot bits, in the order they are packed
+CONTROL_BITS = ("up", "down", "left", "right", "attack", "dash", "interact")
+
+# Per tick: dt (float64), pressed bits (uint8), aim x and y (int16)
+TICK_FORMAT = struct.Struct("<dBhh")
+
+REPLAY_VERSION = 1
+
+
+def pack_controls(dt, controls):
+    bits = 0
+    for i, name in enumerate(CONTROL_BITS):
+        if controls[name]:
+            bits |= 1 << i
+    aim_x, aim_y = controls["aim"]
+    return TICK_FORMAT.pack(dt, bits, aim_x, aim_y)
+
+
+def unpack_controls(data, offset):
+    """
+    :return: (dt, controls) for the tick stored at the given byte offset.
+    """
+    dt, bits, aim_x, aim_y = TICK_FORMAT.unpack_from(data, offset)
+    controls = {name: bool(bits & (1 << i)) for i, name in enumerate(CONTROL_BITS)}
+    controls["aim"] = (aim_x, aim_y)
+    return dt, controls
+
+
+class InputRecorder:
+    """
+    Records everything a run needs to be re-executed exactly: the run seed, the
+    controls and dt of every tick, and the actions taken between ticks (inventory
+    changes, level-up picks, restarts).
+    """
+
+    def __init__(self, seed, settings=None):
+        """
+        :param seed: The run seed passed to reset_game().
+        :param settings: Simulation options the replay must reuse, e.g. {"vectorized": True}.
+        """
+        self.seed = seed
+        self.settings = settings or {}
+        self.ticks = bytearray()
+        self.tick_count = 0
+        self.actions = []  # [tick index, action name, *args]
+
+    def record_tick(self, dt, controls):
+        self.ticks += pack_controls(dt, controls)
+        self.tick_count += 1
+
+    def record_action(self, action):
+        """
+        Records an action applied before the next tick.
+        :param action: A tuple of the action name and its arguments.
+        """
+        self.actions.append([self.tick_count, *action])
+
+    def save(self, path, digest=None):
+        """
+        Writes the log as a zlib-compressed file.
+        :param digest: Optional end-of-run state digest the replay is checked against.
+        """
+        header = json.dumps({
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "settings": self.settings,
+            "ticks": self.tick_count,
+            "actions": self.actions,
+            "digest": digest,
+        }).encode()
+        with open(path, "wb") as f:
+            f.write(zlib.compress(struct.pack("<I", len(header)) + header + bytes(self.ticks)))
+
+
+class Replay:
+    """A recorded run loaded back from an InputRecorder file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = zlib.decompress(f.read())
+        (header_length,) = struct.unpack_from("<I", data)
+        header = json.loads(data[4:4 + header_length])
+        if header["version"] != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {header['version']}")
+        self.seed = header["seed"]
+        self.settings = header["settings"]
+        self.tick_count = header["ticks"]
+        self.digest = header["digest"]
+        self.ticks = data[4 + header_length:]
+
+        # Actions grouped by the tick they precede
+        self.actions = {}
+        for tick, *action in header["actions"]:
+            self.actions.setdefault(tick, []).append(tuple(action))
+
+    def controls(self, tick):
+        """:return: (dt, controls) for a tick."""
+        return unpack_controls(self.ticks, tick * TICK_FORMAT.size)
+
+    def actions_before(self, tick):
+        return self.actions.get(tick, [])
@@ -0,0 +1,126 @@
+import random
+from dataclasses import replace
+
+import pygame
+
+
+def _largest_piece(cuts):
+    """Area of the largest non-empty piece of a cut."""
+    return max((width * height for _, _, width, height in cuts if width > 0 and height > 0), default=0)
+
+
+class FreeSpace:
+    """
+    The area still open for placement, kept as a list of disjoint free rectangles.
+    Any position inside a free rectangle that leaves room for the item is valid, so
+    a placement is one weighted pick instead of repeated random tries against
+    everything placed so far. Occupying a rect splits each free rectangle it
+    overlaps into at most four disjoint pieces (guillotine cuts), so the list stays
+    short and needs no cleanup.
+    """
+
+    def __init__(self, *areas, min_size=1):
+        """
+        :param areas: Rects (or rect-style tuples) of the initially open area.
+        :param min_size: Free pieces narrower or lower than this are dropped; set it
+                         to the smallest item that will be placed.
+        """
+        self.min_size = min_size
+        rects = [pygame.Rect(area) for area in areas]
+        self.free = [rect for rect in rects if rect.width >= min_size and rect.height >= min_size]
+
+    def occupy(self, rect):
+        """Removes a rect from the free space."""
+        min_size = self.min_size
+        pieces = []
+        for free in self.free:
+            if not free.colliderect(rect):
+                pieces.append(free)
+                continue
+            # Cut either full-width strips above and below the rect plus the parts
+            # beside it, or full-height strips left and right plus the parts above
+            # and below, whichever leaves the larger piece
+            top = max(free.top, rect.top)
+            bottom = min(free.bottom, rect.bottom)
+            left = max(free.left, rect.left)
+            right = min(free.right, rect.right)
+            horizontal = (
+                (free.left, free.top, free.width, rect.top - free.top),
+                (free.left, rect.bottom, free.width, free.bottom - rect.bottom),
+                (free.left, top, rect.left - free.left, bottom - top),
+                (rect.right, top, free.right - rect.right, bottom - top),
+            )
+            vertical = (
+                (free.left, free.top, rect.left - free.left, free.height),
+                (rect.right, free.top, free.right - rect.right, free.height),
+                (left, free.top, right - left, rect.top - free.top),
+                (left, rect.bottom, right - left, free.bottom - rect.bottom),
+            )
+            cuts = horizontal if _largest_piece(horizontal) >= _largest_piece(vertical) else vertical
+            for x, y, width, height in cuts:
+                if width >= min_size and height >= min_size:
+                    pieces.append(pygame.Rect(x, y, width, height))
+        self.free = pieces
+
+    def place(self, width, height, rand):
+        """
+        Picks a random free position for a width x height rect and occupies it.
+        :param rand: The random source, e.g. a session's rng.spawn stream.
+        :return: The placed Rect, or None if the rect fits nowhere.
+        """
+        candidates = []
+        total = 0
+        for free in self.free:
+            if free.width >= width and free.height >= height:
+                positions = (free.width - width + 1) * (free.height - height + 1)
+                candidates.append((free, positions))
+                total += positions
+        if not total:
+            return None
+
+        # Weight each free rect by the number of positions it offers
+        pick = rand.randrange(total)
+        for free, positions in candidates:
+            if pick < positions:
+                break
+            pick -= positions
+        columns = free.width - width + 1
+        rect = pygame.Rect(free.x + pick % columns, free.y + pick // columns, width, height)
+        self.occupy(rect)
+        return rect
+
+
+class LayoutPool:
+    """
+    Pre-generated room layouts (walls and enemies) per tier. A pool only ever hands
+    out copies, so one pool can be shared by any number of sessions.
+    """
+
+    def __init__(self, generate, per_tier=32, seed=0):
+        """
+        :param generate: Callable (tier, boss, rand) returning (walls, enemies) for a new room.
+        :param per_tier: Layouts generated for each tier (and separately for its boss room).
+        :param seed: Pool seed. Each tier is rolled from its own stream derived from it,
+                     so the layouts don't depend on the order tiers are filled in.
+        """
+        self.generate = generate
+        self.per_tier = per_tier
+        self.seed = seed
+        self.layouts = {}  # (tier, boss) -> [(walls, enemies)]
+
+    def fill(self, tier, boss=False):
+        """Generates the layouts of a tier up front, if not done yet."""
+        key = (tier, boss)
+        if key not in self.layouts:
+            rand = random.Random(f"{self.seed}:{tier}:{boss}")
+            self.layouts[key] = [self.generate(tier, boss, rand) for _ in range(self.per_tier)]
+
+    def take(self, tier, boss, rand):
+        """
+        Returns a copy of a random pre-generated layout.
+        :param rand: Picks the layout, e.g. a session's rng.layout stream.
+        :return: (walls, enemies), free for the caller to modify.
+        """
+        self.fill(tier, boss)
+        walls, enemies = rand.choice(self.layouts[(tier, boss)])
+        return [wall.copy() for wall in walls], [replace(e, rect=e.rect.copy()) for e in enemies]
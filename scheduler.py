@@ -0,0 +1,67 @@
+import heapq
+import itertools
+
+
+class Timer:
+    """A scheduled callback; cancel() keeps it from firing."""
+
+    __slots__ = ("due", "callback", "args", "cancelled")
+
+    def __init__(self, due, callback, args):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Timers on the simulation clock, kept in a heap ordered by due time.
+
+    Cooldowns, swings, invulnerability windows and the like register a callback
+    for when they run out instead of being compared against the clock every tick.
+    advance() pops only the timers that are due, so a tick costs nothing for the
+    ones still waiting. Timers due at the same time fire in the order they were
+    scheduled, which keeps runs reproducible.
+    """
+
+    def __init__(self, now=0.0):
+        """
+        :param now: The simulation time the scheduler starts at.
+        """
+        self.now = now
+        self._heap = []  # (due, order, Timer)
+        self._order = itertools.count()
+
+    def __len__(self):
+        """:return: The number of timers waiting, cancelled ones included."""
+        return len(self._heap)
+
+    def schedule(self, delay, callback, *args):
+        """
+        Calls callback(*args) once `delay` seconds of simulation time have passed.
+        :return: The Timer, for cancelling it.
+        """
+        timer = Timer(self.now + delay, callback, args)
+        heapq.heappush(self._heap, (timer.due, next(self._order), timer))
+        return timer
+
+    def advance(self, now):
+        """
+        Moves the clock to `now` and fires every timer due by then, in due order.
+        Timers scheduled by a callback fire in the same call if they are due too.
+        """
+        self.now = now
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            timer = heapq.heappop(heap)[2]
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+
+    def clear(self, now=0.0):
+        """Drops every timer without firing it and resets the clock to `now`."""
+        self._heap.clear()
+        self.now = now
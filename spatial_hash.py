@@ -0,0 +1,112 @@
+class SpatialHash:
+    """
+    Uniform-grid broadphase for rect collision queries.
+    Every item is bucketed into each grid cell its rect overlaps, so a query only
+    tests the items sharing a cell with the query rect instead of every item.
+    """
+
+    def __init__(self, cell_size=64):
+        """
+        :param cell_size: Width and height of a grid cell in pixels.
+        """
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> {id(item): item}
+        self.entries = {}  # id(item) -> [item, rect, cell keys]
+        # Totals over the index's lifetime, read by the frame profiler
+        self.queries = 0  # query() and collides() calls
+        self.rect_tests = 0  # Candidate rects tested by them
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _cell_keys(self, rect):
+        """Returns the grid cells covered by a rect."""
+        size = self.cell_size
+        x0 = rect.left // size
+        x1 = (rect.right - 1) // size
+        y0 = rect.top // size
+        y1 = (rect.bottom - 1) // size
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def insert(self, item, rect):
+        """
+        Adds an item to the index.
+        :param item: Any object; it is tracked by identity.
+        :param rect: The item's pygame.Rect. The reference is kept, so in-place
+                     changes to it are picked up by move(item).
+        """
+        item_id = id(item)
+        keys = self._cell_keys(rect)
+        for key in keys:
+            self.cells.setdefault(key, {})[item_id] = item
+        self.entries[item_id] = [item, rect, keys]
+
+    def remove(self, item):
+        """Removes an item from the index (no-op if it is not indexed)."""
+        item_id = id(item)
+        entry = self.entries.pop(item_id, None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            bucket = self.cells[key]
+            del bucket[item_id]
+            if not bucket:
+                del self.cells[key]
+
+    def move(self, item, rect=None):
+        """
+        Re-buckets an item after its rect changed.
+        :param rect: The new rect; defaults to the rect passed to insert().
+        """
+        item_id = id(item)
+        entry = self.entries.get(item_id)
+        if entry is None:
+            self.insert(item, rect)
+            return
+        if rect is not None:
+            entry[1] = rect
+        keys = self._cell_keys(entry[1])
+        if keys == entry[2]:
+            return  # Still in the same cells
+        for key in entry[2]:
+            bucket = self.cells[key]
+            del bucket[item_id]
+            if not bucket:
+                del self.cells[key]
+        for key in keys:
+            self.cells.setdefault(key, {})[item_id] = item
+        entry[2] = keys
+
+    def query(self, rect):
+        """
+        :param rect: The rect to test.
+        :return: A list of the indexed items whose rect collides with it.
+        """
+        self.queries += 1
+        found = {}
+        for key in self._cell_keys(rect):
+            bucket = self.cells.get(key)
+            if not bucket:
+                continue
+            self.rect_tests += len(bucket)
+            for item_id, item in bucket.items():
+                if item_id not in found and self.entries[item_id][1].colliderect(rect):
+                    found[item_id] = item
+        return list(found.values())
+
+    def collides(self, rect):
+        """Returns True as soon as any indexed item collides with the rect."""
+        self.queries += 1
+        for key in self._cell_keys(rect):
+            bucket = self.cells.get(key)
+            if not bucket:
+                continue
+            self.rect_tests += len(bucket)
+            for item_id in bucket:
+                if self.entries[item_id][1].colliderect(rect):
+                    return True
+        return False
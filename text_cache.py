@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+import pygame
+
+# Fonts are built once per (name, size) and shared by every screen.
+_fonts = {}
+
+def get_font(size, name=None):
+    """
+    Returns the shared font for a name and size, creating it on first use.
+    :param size: Font size in points.
+    :param name: System font name; None for pygame's default font.
+    """
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()  # Deferred until the first text is drawn
+        font = _fonts[key] = pygame.font.SysFont(name, size)
+    return font
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed by (font, text, color, wrap width),
+    so text that did not change since the last frame only costs a blit.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def _get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)  # Drop the least recently used
+        return value
+
+    def render(self, font, text, color):
+        """Returns the rendered (antialiased) surface for a single line of text."""
+        key = (font, text, color, None)
+        surface = self._get(key)
+        if surface is None:
+            surface = self._put(key, font.render(text, True, color))
+        return surface
+
+    def render_wrapped(self, font, text, color, max_width):
+        """
+        Word-wraps text to max_width pixels.
+        :return: A list of (surface, y offset) pairs, one per line.
+        """
+        key = (font, text, color, max_width)
+        lines = self._get(key)
+        if lines is not None:
+            return lines
+
+        lines = []
+        line = ""
+        height = 0
+        for word in text.split(' '):
+            test_line = line + word + " "
+            if font.size(test_line)[0] > max_width:
+                lines.append((font.render(line, True, color), height))
+                height += font.get_linesize()
+                line = word + " "
+            else:
+                line = test_line
+        if line:
+            lines.append((font.render(line, True, color), height))
+        return self._put(key, lines)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Shared cache for the HUD, inventory and menus
+text_cache = TextCache()
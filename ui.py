@@ -0,0 +1,120 @@
+import pygame
+
+from text_cache import get_font, text_cache
+
+
+class Widget:
+    """
+    Node of a retained UI tree. Its rect is worked out once, when the tree is
+    built, and reused by every draw and every hit test until the tree is rebuilt.
+    """
+
+    def __init__(self, rect, children=(), action=None):
+        """
+        :param rect: The widget's area on screen.
+        :param children: Widgets drawn on top of this one, in order.
+        :param action: What a click on the widget does, as a tuple like
+                       ("inventory", "Weapons", item); None if it ignores clicks.
+        """
+        self.rect = pygame.Rect(rect)
+        self.children = list(children)
+        self.action = action
+
+    def draw(self, surface, context):
+        """
+        Draws the widget and its children.
+        :param context: Per-frame display state, e.g. {"delete_mode": True, "hover": widget}.
+        """
+        self.draw_self(surface, context)
+        for child in self.children:
+            child.draw(surface, context)
+
+    def draw_self(self, surface, context):
+        pass
+
+    def walk(self):
+        """Yields the widget and all its descendants, in drawing order."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class Box(Widget):
+    """A filled (or outlined) rect."""
+
+    def __init__(self, rect, color, children=(), action=None, delete_color=None, border=0):
+        """
+        :param delete_color: Fill used instead of color while delete mode is on.
+        :param border: Outline width; 0 fills the rect.
+        """
+        super().__init__(rect, children, action)
+        self.color = color
+        self.delete_color = delete_color
+        self.border = border
+
+    def draw_self(self, surface, context):
+        color = self.color
+        if self.delete_color is not None and context.get("delete_mode"):
+            color = self.delete_color
+        pygame.draw.rect(surface, color, self.rect, self.border)
+
+
+class Label(Widget):
+    """
+    One line of text. The rect is the size of the rendered text; hover_color
+    highlights it when it is the context's "hover" widget.
+    """
+
+    def __init__(self, text, font_size, color, topleft=None, center=None, action=None, hover_color=None, hover_text_color=None):
+        self.font = get_font(font_size)
+        rect = pygame.Rect((0, 0), self.font.size(text))
+        if center is not None:
+            rect.center = center
+        else:
+            rect.topleft = topleft
+        super().__init__(rect, (), action)
+        self.text = text
+        self.color = color
+        self.hover_color = hover_color
+        self.hover_text_color = hover_text_color
+
+    def draw_self(self, surface, context):
+        surface.blit(text_cache.render(self.font, self.text, self.color), self.rect)
+        if self.hover_color is not None and context.get("hover") is self:
+            pygame.draw.rect(surface, self.hover_color, self.rect.inflate(10, 10), border_radius=5)
+            surface.blit(text_cache.render(self.font, self.text, self.hover_text_color), self.rect)
+
+
+class TextBlock(Widget):
+    """Text word-wrapped to the width of its rect, starting at its top left."""
+
+    def __init__(self, rect, text, font_size, color, action=None):
+        super().__init__(rect, (), action)
+        self.font = get_font(font_size)
+        self.text = text
+        self.color = color
+
+    def draw_self(self, surface, context):
+        for line_surface, line_y in text_cache.render_wrapped(self.font, self.text, self.color, self.rect.width):
+            surface.blit(line_surface, (self.rect.x, self.rect.y + line_y))
+
+
+class Layout:
+    """
+    A laid-out widget tree with an index of the widgets that take clicks, so
+    drawing and hit-testing share one set of rects.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.targets = [widget for widget in root.walk() if widget.action is not None]
+
+    def draw(self, surface, **context):
+        self.root.draw(surface, context)
+
+    def hit(self, pos):
+        """:return: The topmost clickable widget containing pos, or None."""
+        for widget in reversed(self.targets):
+            if widget.rect.collidepoint(pos):
+                return widget
+        return None
@@ -0,0 +1,82 @@
+import operator
+
+# Comparison operators a Wildboy condition may use
+OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    ">": operator.gt,
+}
+
+
+def validate_condition(condition, stat_names):
+    """
+    Checks a Wildboy condition of the form (stat, op, threshold).
+    :param stat_names: The stats a condition may refer to.
+    :raises ValueError: If the condition is malformed or names an unknown stat or operator.
+    """
+    if not isinstance(condition, tuple) or len(condition) != 3:
+        raise ValueError(f"Wildboy condition must be a (stat, op, threshold) tuple, got {condition!r}")
+    stat, op, threshold = condition
+    if stat not in stat_names:
+        raise ValueError(f"Unknown stat {stat!r} in Wildboy condition {condition!r}")
+    if op not in OPS:
+        raise ValueError(f"Unknown operator {op!r} in Wildboy condition {condition!r}")
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+        raise ValueError(f"Threshold of Wildboy condition {condition!r} must be a number")
+
+
+def validate_wildboys(wildboys, stat_names):
+    """Validates the condition of every Wildboy in a table (see validate_condition())."""
+    for wildboy in wildboys:
+        try:
+            validate_condition(wildboy.condition, stat_names)
+        except ValueError as error:
+            raise ValueError(f"{wildboy.name}: {error}") from None
+
+
+class WildboyConditions:
+    """
+    The conditions of a set of equipped Wildboys, compiled into one list of
+    distinct checks. active() evaluates every check in a single pass, and only when
+    one of the stats the checks watch has changed since the last call.
+    """
+
+    def __init__(self, wildboys):
+        """
+        :param wildboys: The equipped Wildboys, with validated conditions.
+        """
+        self.wildboys = list(wildboys)
+
+        # Wildboys sharing a condition share its check
+        checks = {}  # (stat, op, threshold) -> indices into self.wildboys
+        for i, wildboy in enumerate(self.wildboys):
+            checks.setdefault(wildboy.condition, []).append(i)
+        self.checks = [(stat, OPS[op], threshold, indices) for (stat, op, threshold), indices in checks.items()]
+        self.watched = tuple(dict.fromkeys(stat for stat, _, _, _ in self.checks))
+
+        self.watched_values = None  # Values of the watched stats at the last evaluation
+        self.active_wildboys = ()
+
+    def active(self, stats):
+        """
+        :param stats: The stats the conditions are checked against.
+        :return: A tuple of the Wildboys whose condition holds. The same tuple object
+                 is returned for as long as the result doesn't change.
+        """
+        values = tuple(stats[stat] for stat in self.watched)
+        if values == self.watched_values:
+            return self.active_wildboys
+        self.watched_values = values
+
+        active = [False] * len(self.wildboys)
+        for stat, test, threshold, indices in self.checks:
+            if test(stats[stat], threshold):
+                for i in indices:
+                    active[i] = True
+        result = tuple(wildboy for wildboy, on in zip(self.wildboys, active) if on)
+        if result != self.active_wildboys:
+            self.active_wildboys = result
+        return self.active_wildboys